@@ -1,28 +1,24 @@
 from pyminitel.mode import Mode
 from pyminitel.keyboard import FunctionKeyboardCode, FilterKeyboardCode
 from pyminitel.page import Page
+from pyminitel.resources import getResourceStore
 
 from logging import log, ERROR
 
 import os
 
+RESSOURCES = getResourceStore(os.path.join('.', 'src', 'examples', 'ressources'))
+
 class GuidePage(Page):
 
     def __init__(self, minitel=...) -> None:
         super().__init__(minitel)
 
-        self.page = b''
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'GUIDE_VGP5_.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-
-        with open(filepath, 'rb') as binary_file:
-            self.page = binary_file.read()
-            binary_file.close()
+        self.page = RESSOURCES.get('GUIDE', self.minitel.getVisualizationModule())
 
     def print_page(self):
         self.minitel.clear()
-        self.minitel.send(self.page)
+        self.minitel.send(self.page, shadowed=False)
         self.minitel.beep()
         self.minitel.getMinitelInfo()
 
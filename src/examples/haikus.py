@@ -4,10 +4,18 @@ from pyminitel.layout import Layout
 from pyminitel.keyboard import *
 from pyminitel.visualization_module import *
 from pyminitel.page import Page
+from pyminitel.resources import getResourceStore
+from pyminitel.render_cache import RenderCache
+from pyminitel.videotex_codec import encodeText
 from pyminitel.videotex import RESOLUTION, Mode
 
+from functools import partial
+
 import os, time, redis, json, random
 
+RESSOURCES = getResourceStore(os.path.join('.', 'src', 'examples', 'ressources'))
+RENDERS = RenderCache()
+
 redis_host = os.getenv("REDIS_HOST", "localhost")
 redis_port = int(os.getenv("REDIS_PORT", 6379))
 
@@ -41,74 +49,63 @@ class HaikusPage(Page):
         #     self.page = binary_file.read()
         #     binary_file.close()
 
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'HAIKU.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-        with open(filepath, 'rb') as binary_file:
-            self.logo = binary_file.read()
-            binary_file.close()
-
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'FOX_LEFT.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-        with open(filepath, 'rb') as binary_file:
-            self.fox_l = binary_file.read()
-            binary_file.close()
-
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'FOX_RIGHT.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-        with open(filepath, 'rb') as binary_file:
-            self.fox_r = binary_file.read()
-            binary_file.close()
+        self.logo = RESSOURCES.get('HAIKU')
+
+        self.fox_l = RESSOURCES.get('FOX_LEFT')
+
+        self.fox_r = RESSOURCES.get('FOX_RIGHT')
     
     def print_random_daily_haiku(self):
 
         response = self._redis.get(self.HAIKUS_KEY)
-        if response is None:
-            no_haikus = "No haikus today"
-            r = (RESOLUTION[Mode.VIDEOTEX][0]) // 2
-            c = (RESOLUTION[Mode.VIDEOTEX][1] - len(no_haikus)) // 2
+        haikus = None if response is None else json.loads(response)
+
+        random_index = None
+        if haikus is not None and len(haikus) != 0:
+            random_index = random.randint(0, len(haikus) - 1)
+
+        # Each haiku is rendered once per haikus update, whatever the sessions count
+        vm = self.minitel.getVisualizationModule()
+        self.minitel.send(RENDERS.get('haiku:' + str(random_index), response, vm, partial(self.render_haiku, haikus, random_index, vm)))
 
-            self.minitel.send(Layout.setCursorPosition(r, c))
-            self.minitel.print(no_haikus)
+    def render_haiku(self, haikus: list, index: int, vm: VisualizationModule) -> bytes:
+        # Shared by sessions whatever their state, a semi graphic page may have left G1 selected
+        data = b'\x0f'
 
-            return
-        haikus = json.loads(response)
-        if haikus is None or len(haikus) == 0:
+        if index is None:
             no_haikus = "No haikus today"
             r = (RESOLUTION[Mode.VIDEOTEX][0]) // 2
             c = (RESOLUTION[Mode.VIDEOTEX][1] - len(no_haikus)) // 2
 
-            self.minitel.send(Layout.setCursorPosition(r, c))
-            self.minitel.print(no_haikus)
+            data += Layout.setCursorPosition(r, c)
+            data += encodeText(no_haikus, vm)
 
-            return
+            return data
 
-        random_index = random.randint(0, len(haikus) - 1)
-
-        text = haikus[random_index]['text']
+        text = haikus[index]['text']
         lines = text.splitlines()
         
         r = (RESOLUTION[Mode.VIDEOTEX][0] - len(lines)) // 2
         for line in lines:
             c = (RESOLUTION[Mode.VIDEOTEX][1] - len(line)) // 2
-            self.minitel.send(Layout.setCursorPosition(r, c))
-            self.minitel.print(line)
+            data += Layout.setCursorPosition(r, c)
+            data += encodeText(line, vm)
             r = r + 1
         
-        author = haikus[random_index]['author']
+        author = haikus[index]['author']
         
-        self.minitel.send(Layout.setCursorPosition(r + 1, 10))
-        self.minitel.print(align_right('-' + author, 20))
+        data += Layout.setCursorPosition(r + 1, 10)
+        data += encodeText(align_right('-' + author, 20), vm)
+
+        return data
 
 
     def print_page(self):
         self.minitel.clear()
-        self.minitel.send(self.page)
-        self.minitel.send(self.logo)
-        self.minitel.send(self.fox_l)
-        self.minitel.send(self.fox_r)
+        self.minitel.send(self.page, shadowed=False)
+        self.minitel.send(self.logo, shadowed=False)
+        self.minitel.send(self.fox_l, shadowed=False)
+        self.minitel.send(self.fox_r, shadowed=False)
         self.print_random_daily_haiku()
         self.minitel.beep()
         self.minitel.getMinitelInfo()
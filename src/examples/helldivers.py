@@ -4,14 +4,22 @@ from pyminitel.layout import Layout
 from pyminitel.keyboard import *
 from pyminitel.visualization_module import *
 from pyminitel.page import Page
+from pyminitel.resources import getResourceStore
 from pyminitel.videotex import Videotex
+from pyminitel.render_cache import RenderCache
 
 
 from logging import log, ERROR
 from math import log, floor
 
+from functools import partial
+from itertools import chain
+
 import time, os, re, textwrap, datetime, redis, json
 
+RESSOURCES = getResourceStore(os.path.join('.', 'src', 'examples', 'ressources'))
+RENDERS = RenderCache()
+
 KEY_CAMPAIGNS = "HELLDIVERS-CAMPAIGNS"
 KEY_ASSIGNMENTS = "HELLDIVERS-ASSIGNMENTS"
 
@@ -88,32 +96,27 @@ class HelldiversPage(Page):
         self.page = b''
         self.logo = b''
 
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'HELLDIVERS_VGP5_.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-
-        with open(filepath, 'rb') as binary_file:
-            self.page = binary_file.read()
-            binary_file.close()
+        self.page = RESSOURCES.get('HELLDIVERS', self.minitel.getVisualizationModule())
 
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'HELLDIVERS_SG.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-        with open(filepath, 'rb') as binary_file:
-            self.logo = binary_file.read()
-            binary_file.close()
+        self.logo = RESSOURCES.get('HELLDIVERS_SG')
 
     def draw_major_order(self):
+        # Rendered once per update of the assignments, whatever the sessions count
+        assignments = self._redis.get(KEY_ASSIGNMENTS)
+        vm = self.minitel.getVisualizationModule()
+        self.minitel.sendStream(RENDERS.iterate('major-order', assignments, vm, partial(self.render_major_order, assignments, vm)))
+
+    def render_major_order(self, assignments: bytes, vm: VisualizationModule):
         page = Videotex()
 
         for j in range(3):
             for i in range(25):
                 page.setText(' ', 6 + j, 2 + i)
 
-        assignments = json.loads(self._redis.get(KEY_ASSIGNMENTS))
+        assignments = json.loads(assignments)
         print(assignments)
         if assignments is None or len(assignments) == 0:
-            return
+            return ()
 
         major_order = re.sub(CLEANR, '', assignments[0]['briefing'])
         
@@ -122,11 +125,14 @@ class HelldiversPage(Page):
         page.setText(lines[1], 7, 2)
         page.setText(lines[2], 8, 2)
 
-        self.minitel.send(page.toVideotex(self.minitel.getVisualizationModule()))
+        # Rows streamed as they are encoded
+        return page.iterVideotex(vm)
 
-    def getPlanets(self):
+    def getPlanets(self, campaigns: bytes = None):
 
-        campaigns = json.loads(self._redis.get(KEY_CAMPAIGNS))
+        if campaigns is None:
+            campaigns = self._redis.get(KEY_CAMPAIGNS)
+        campaigns = json.loads(campaigns)
         if campaigns is None:
             return []
 
@@ -159,15 +165,23 @@ class HelldiversPage(Page):
         return planets
 
     def draw_planets_status(self):
+        # Each planets page is rendered once per update of the campaigns, whatever the sessions count
+        campaigns = self._redis.get(KEY_CAMPAIGNS)
+        vm = self.minitel.getVisualizationModule()
+        page_id = 'planets:' + str(self.planet_page_index)
+        self.minitel.sendStream(RENDERS.iterate(page_id, campaigns, vm, partial(self.render_planets_status, campaigns, self.planet_page_index, vm)))
+
+    def render_planets_status(self, campaigns: bytes, planet_page_index: int, vm: VisualizationModule):
         page = Videotex()
+        data = b''
         for j in range(11):
-            self.minitel.send(Layout.setCursorPosition(j + 12, 1))
-            self.minitel.send(Layout.eraseInLine())
+            data += Layout.setCursorPosition(j + 12, 1)
+            data += Layout.eraseInLine()
 
-        all_planets = self.getPlanets()
+        all_planets = self.getPlanets(campaigns)
         
-        min_range = self.planet_page_index * HelldiversPage.PLANET_PER_PAGE
-        max_range = self.planet_page_index * HelldiversPage.PLANET_PER_PAGE + HelldiversPage.PLANET_PER_PAGE
+        min_range = planet_page_index * HelldiversPage.PLANET_PER_PAGE
+        max_range = planet_page_index * HelldiversPage.PLANET_PER_PAGE + HelldiversPage.PLANET_PER_PAGE
         if max_range > len(all_planets):
             max_range = len(all_planets)
 
@@ -191,13 +205,13 @@ class HelldiversPage(Page):
             page.setText(text=align_right(str(human_format(planets[index]['player_count'])), 7), r=12 + index, c=25, attribute=item_text_attr)
             page.setText(text=align_right(str(format_status(planets[index])), 8), r=12 + index, c=32, attribute=item_text_attr)
 
-        self.minitel.send(page.toVideotex(self.minitel.getVisualizationModule()))
+        return chain((data,), page.iterVideotex(vm))
 
 
     def print_page(self):
         self.minitel.clear()
-        self.minitel.send(self.page)
-        self.minitel.send(self.logo)
+        self.minitel.send(self.page, shadowed=False)
+        self.minitel.send(self.logo, shadowed=False)
         self.draw_major_order()
         self.draw_planets_status()
         self.minitel.beep()
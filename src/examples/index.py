@@ -76,25 +76,26 @@ def callback_refresh_page():
     global minitel
     global page
     
-    minitel.clear()
-    minitel.setScreenPageMode()
-    minitel.setVideoMode(Mode.VIDEOTEX)
-    minitel.send(page)
+    with minitel.batch():
+        minitel.clear()
+        minitel.setScreenPageMode()
+        minitel.setVideoMode(Mode.VIDEOTEX)
+        minitel.send(page, shadowed=False)
 
-    if not is_code_else_ip:
-        minitel.send(Layout.setCursorPosition(10,1))
-        minitel.setTextAttributes(inverted=False)
-        minitel.print('CODE|')
-        minitel.setTextAttributes(inverted=True)
-        minitel.print('IP')
-        minitel.setTextAttributes(inverted=False)
+        if not is_code_else_ip:
+            minitel.send(Layout.setCursorPosition(10,1))
+            minitel.setTextAttributes(inverted=False)
+            minitel.print('CODE|')
+            minitel.setTextAttributes(inverted=True)
+            minitel.print('IP')
+            minitel.setTextAttributes(inverted=False)
 
 
-    minitel.send(Layout.setCursorPosition(10, 10))
-    if len(prompt):
-        minitel.print(prompt)
+        minitel.send(Layout.setCursorPosition(10, 10))
+        if len(prompt):
+            minitel.print(prompt)
     
-    minitel.beep()
+        minitel.beep()
 
 def callback_send():
     global prompt
@@ -4,13 +4,74 @@ from pyminitel.layout import Layout
 from pyminitel.keyboard import *
 from pyminitel.visualization_module import *
 from pyminitel.page import Page
+from pyminitel.resources import getResourceStore
+from pyminitel.render_cache import RenderCache
+from pyminitel.broadcast import BroadcastHub
+from pyminitel.videotex_codec import encodeText
 from pyminitel.mode import RESOLUTION, Mode
 
-import os, datetime, time, redis, json
+from functools import partial
+
+import os, datetime, time, redis, json, threading
+
+RESSOURCES = getResourceStore(os.path.join('.', 'src', 'examples', 'ressources'))
+RENDERS = RenderCache()
+HUB = BroadcastHub()
+
+ISS_POSITIONS_TOPIC = 'iss-positions'
 
 redis_host = os.getenv("REDIS_HOST", "localhost")
 redis_port = int(os.getenv("REDIS_PORT", 6379))
 
+
+class ISSPublisher(threading.Thread):
+    '''
+    Broadcasts the ISS positions to the subscribed pages each time a new one is received, with a Redis client of its own.
+    Started by the first page subscribing, it stops once the last one unsubscribes.
+    '''
+
+    # Interval (s) at which the positions counter is checked
+    PUBLISH_INTERVAL = 1
+
+    _running = None
+    _lock = threading.Lock()
+
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def subscribe(cls, minitel: Minitel):
+        with cls._lock:
+            HUB.subscribe(ISS_POSITIONS_TOPIC, minitel)
+            if cls._running is None:
+                cls._running = cls()
+                cls._running.start()
+
+    @classmethod
+    def unsubscribe(cls, minitel: Minitel):
+        with cls._lock:
+            HUB.unsubscribe(ISS_POSITIONS_TOPIC, minitel)
+            if cls._running is not None and not HUB.getSubscriberCount(ISS_POSITIONS_TOPIC):
+                cls._running.stop()
+                cls._running = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        client = redis.StrictRedis(host=redis_host, port=redis_port)
+        try:
+            version = client.get(ISSPage.ISS_KEY_PREFIX + ':counter')
+            while not self._stop_event.wait(self.PUBLISH_INTERVAL):
+                counter = client.get(ISSPage.ISS_KEY_PREFIX + ':counter')
+                if counter != version:
+                    version = counter
+                    HUB.publish(ISS_POSITIONS_TOPIC, lambda vm: RENDERS.get('iss-positions', version, vm, partial(ISSPage.render_iss_positions, client, vm)))
+        finally:
+            client.close()
+
+
 class ISSPage(Page):
 
     MAP_WIDTH = 80
@@ -26,6 +87,10 @@ class ISSPage(Page):
 
     ISS_KEY_PREFIX = "ISS"
 
+    # Positions' attributes, the last one known blinking
+    POSITION_ATTRIBUTES = SemiGraphicsAttributes().withAttributes(color=CharacterColor.RED, blinking=False, background=BackgroundColor.BLUE, disjointed=True)
+    LAST_POSITION_ATTRIBUTES = POSITION_ATTRIBUTES.withAttributes(blinking=True)
+
     def __init__(self, minitel: Minitel) -> None:
         super().__init__(minitel)
 
@@ -34,27 +99,18 @@ class ISSPage(Page):
         self.page = b''
         self.map = b''
 
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'ISS_VGP5_.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
+        self.page = RESSOURCES.get('ISS', self.minitel.getVisualizationModule())
 
-        with open(filepath, 'rb') as binary_file:
-            self.page = binary_file.read()
-            binary_file.close()
+        self.logo = RESSOURCES.get('EARTH_MAP')
 
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'EARTH_MAP.VDT')
-        if not os.path.exists(filepath):
-            log(ERROR, "File not found: " + str(filepath))
-        with open(filepath, 'rb') as binary_file:
-            self.logo = binary_file.read()
-            binary_file.close()
-
-    def geo_to_map(self, lat, lon):
+    @staticmethod
+    def geo_to_map(lat, lon):
         x = int((lon - ISSPage.LONGITUDE_RANGE[0]) / (ISSPage.LONGITUDE_RANGE[1] - ISSPage.LONGITUDE_RANGE[0]) * (ISSPage.MAP_WIDTH - 1))
         y = int((lat - ISSPage.LATITUDE_RANGE[0]) / (ISSPage.LATITUDE_RANGE[1] - ISSPage.LATITUDE_RANGE[0]) * (ISSPage.MAP_HEIGHT - 1))
         return x, y
 
-    def get_cell_indices_and_position(self, x, y):
+    @staticmethod
+    def get_cell_indices_and_position(x, y):
     
         cell_x = int(x // ISSPage.CELL_WIDTH)
         cell_y = int(y // ISSPage.CELL_HEIGHT)
@@ -64,14 +120,16 @@ class ISSPage(Page):
 
         return cell_x, cell_y, rel_x, rel_y
     
-    def render_cell(self, rel_x, rel_y):
+    @staticmethod
+    def render_cell(rel_x, rel_y):
         cell = [0 for _ in range(ISSPage.CELL_WIDTH * ISSPage.CELL_HEIGHT)]
         index = rel_y * ISSPage.CELL_WIDTH + rel_x
         cell[index] = 1
 
         return cell
     
-    def semi_graphic_to_hex(self, semi_graphic) -> bytes:
+    @staticmethod
+    def semi_graphic_to_hex(semi_graphic) -> bytes:
         byte = 0
         byte += semi_graphic[0]
         byte += semi_graphic[1] << 1
@@ -87,17 +145,25 @@ class ISSPage(Page):
 
         return byte.to_bytes()
 
-    def get_all_items(self, key_prefix):
-        keys = self._redis.keys(f"{key_prefix}:*")
-        items = {key.decode('utf-8'): json.loads(self._redis.get(key)) for key in keys}
+    @staticmethod
+    def get_all_items(client, key_prefix):
+        keys = client.keys(f"{key_prefix}:*")
+        items = {key.decode('utf-8'): json.loads(client.get(key)) for key in keys}
 
         items.pop(ISSPage.ISS_KEY_PREFIX + ':counter', None)
 
         return items
     
     def print_iss_positions(self):
+        # Rendered once per position received, whatever the sessions count
+        version = self._redis.get(ISSPage.ISS_KEY_PREFIX + ':counter')
+        vm = self.minitel.getVisualizationModule()
+        self.minitel.send(RENDERS.get('iss-positions', version, vm, partial(ISSPage.render_iss_positions, self._redis, vm)))
+
+    @staticmethod
+    def render_iss_positions(client, vm: VisualizationModule) -> bytes:
 
-        positions = self.get_all_items(ISSPage.ISS_KEY_PREFIX)
+        positions = ISSPage.get_all_items(client, ISSPage.ISS_KEY_PREFIX)
 
         sorted_positions = dict(sorted(positions.items(), key=lambda x: x[1]['timestamp'], reverse=True))
         iss_counter = len(sorted_positions)
@@ -111,42 +177,47 @@ class ISSPage(Page):
 
         last_pos_key, last_pos_value = next(iter(printable_position.items()))
 
-        self.minitel.send(Layout.setCursorPosition(5))
-        self.minitel.send(Layout.eraseInLine(csi_k=Layout.CSI_K.FROM_CURSOR_TO_EOL))
-        self.minitel.send(Layout.setCursorPosition(5, 1))
-        self.minitel.print(str(datetime.datetime.fromtimestamp(last_pos_value['timestamp'])))
-        self.minitel.send(Layout.setCursorPosition(5, 22))
-        self.minitel.print(str(last_pos_value['iss_position']['latitude']))
-        self.minitel.send(Layout.setCursorPosition(5, 32))
-        self.minitel.print(str(last_pos_value['iss_position']['longitude']))
+        # Shared by sessions whatever their state, a semi graphic page may have left G1 selected
+        data = b'\x0f' + Layout.setCursorPosition(5)
+        data += Layout.eraseInLine(csi_k=Layout.CSI_K.FROM_CURSOR_TO_EOL)
+        data += Layout.setCursorPosition(5, 1)
+        data += encodeText(str(datetime.datetime.fromtimestamp(last_pos_value['timestamp'])), vm)
+        data += Layout.setCursorPosition(5, 22)
+        data += encodeText(str(last_pos_value['iss_position']['latitude']), vm)
+        data += Layout.setCursorPosition(5, 32)
+        data += encodeText(str(last_pos_value['iss_position']['longitude']), vm)
         blinking = True
 
         for key, value in printable_position.items():
-            x, y = self.geo_to_map(float(value['iss_position']['latitude']), float(value['iss_position']['longitude']))
-            cell_x, cell_y, rel_x, rel_y = self.get_cell_indices_and_position(x, y)
+            x, y = ISSPage.geo_to_map(float(value['iss_position']['latitude']), float(value['iss_position']['longitude']))
+            cell_x, cell_y, rel_x, rel_y = ISSPage.get_cell_indices_and_position(x, y)
 
             if (cell_x) != 1 and (cell_x) != RESOLUTION[Mode.VIDEOTEX][1]:
-                semi_graphic = self.render_cell(rel_x, rel_y)
-                data = Layout.setCursorPosition(RESOLUTION[Mode.VIDEOTEX][0] - cell_y - 3, cell_x)
+                semi_graphic = ISSPage.render_cell(rel_x, rel_y)
+                data += Layout.setCursorPosition(RESOLUTION[Mode.VIDEOTEX][0] - cell_y - 3, cell_x)
                 data += b'\x0e'
-                data += SemiGraphicsAttributes().setAttributes(color=CharacterColor.RED, blinking=blinking, background=BackgroundColor.BLUE, disjointed=True)
-                data += self.semi_graphic_to_hex(semi_graphic)
+                data += SEMI_GRAPHICS_TRANSITIONS.get(None, ISSPage.LAST_POSITION_ATTRIBUTES if blinking else ISSPage.POSITION_ATTRIBUTES)
+                data += ISSPage.semi_graphic_to_hex(semi_graphic)
                 data += b'\x0f'
 
-                self.minitel.send(data)
                 blinking = False
 
+        return data
+
 
     def print_page(self):
-        self.minitel.clear()
-        self.minitel.send(self.page)
-        self.minitel.send(self.logo)
-        self.print_iss_positions()
-        self.minitel.beep()
+        # One message, the positions broadcast can't come in the middle
+        with self.minitel.batch():
+            self.minitel.clear()
+            self.minitel.send(self.page, shadowed=False)
+            self.minitel.send(self.logo, shadowed=False)
+            self.print_iss_positions()
+            self.minitel.beep()
         self.minitel.getMinitelInfo()
 
         
     def callback_quit(self):
+        ISSPublisher.unsubscribe(self.minitel)
         self.minitel.clear()
         time.sleep(2)
         self.minitel.getMinitelInfo()
@@ -157,6 +228,7 @@ class ISSPage(Page):
         self.minitel.disableEcho()
         self.minitel.setConnectorBaudrate(Minitel.ConnectorBaudrate.BAUDS_4800, Minitel.ConnectorBaudrate.BAUDS_4800)
         self.print_page()
+        ISSPublisher.subscribe(self.minitel)
 
         self.minitel.clearBindings()
 
@@ -167,3 +239,5 @@ class ISSPage(Page):
         self.minitel.enableKeyboard(update_cursor=False)
         while not self.stopped():
             self.minitel.readKeyboard(0.1)
+
+        ISSPublisher.unsubscribe(self.minitel)
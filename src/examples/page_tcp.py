@@ -22,7 +22,7 @@ if not os.path.exists(filepath):
     log(ERROR, "File not found: " + str(filepath))
     exit()
 with open(filepath, 'rb') as binary_file:
-    minitel.send(binary_file.read())
+    minitel.send(binary_file.read(), shadowed=False)
     binary_file.close()
 minitel.beep()
 minitel.getMinitelInfo()
@@ -84,8 +84,10 @@ attribute = SemiGraphicsAttributes()
 attribute.setAttributes(color=CharacterColor.WHITE, blinking=False, background=BackgroundColor.BLACK, disjointed=False)
 
 destination=os.path.join('.', 'src', 'examples', 'ressources', output)
-with open(destination, "wb") as file:
+# Written aside then renamed, a server reading the file meanwhile gets either page whole
+with open(destination + '.tmp', "wb") as file:
     file.write(png_to_vdt(input, offset_r = 22-6, offset_c = 39-7, attribute=attribute))
+os.replace(destination + '.tmp', destination)
 
 
 
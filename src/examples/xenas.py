@@ -1,9 +1,10 @@
-import os, sys, ipaddress, socket, _thread, logging
+import os, sys, ipaddress, logging
 
 from enum import Enum
 
 
-from pyminitel.connector import get_connected_serial_minitel
+from pyminitel.server import MinitelServer, Session
+from pyminitel.resources import getResourceStore
 from pyminitel.mode import Mode
 from pyminitel.keyboard import FunctionKeyboardCode, FilterKeyboardCode
 from pyminitel.layout import Layout
@@ -17,6 +18,8 @@ from examples.haikus import HaikusPage
 
 from examples.guide import GuidePage
 
+RESSOURCES = getResourceStore(os.path.join('.', 'src', 'examples', 'ressources'))
+
 SERVICES = {
     'marnie': MarniePage,
     '01': MarniePage,
@@ -50,23 +53,19 @@ class ServiceContext():
         self.is_code_else_ip = True 
 
 class ClientHandler():
-    def __init__(self, client_socket, srv_ctx) -> None:
+    def __init__(self, session: Session, srv_ctx) -> None:
         self.srv_ctx = srv_ctx
-        self.minitel = get_connected_serial_minitel(tcp=client_socket)
+        self.session = session
+        self.minitel = session.minitel
         self.page = b''
 
     def handle(self):
-        filepath = os.path.join('.', 'src', 'examples', 'ressources', 'INDEX_VGP5_.VDT')
-        if not os.path.exists(filepath):
-            logging.log(logging.ERROR, "File not found: " + str(filepath))
-            exit()
-
-        with open(filepath, 'rb') as binary_file:
-            self.page = binary_file.read()
-            binary_file.close()
+        self.page = RESSOURCES.get('INDEX', self.minitel.getVisualizationModule())
+        if self.page is None:
+            return
 
         
-        while not self.srv_ctx.disconnected and self.minitel:
+        while not self.srv_ctx.disconnected and not self.session.stopped():
             self.minitel.disableEcho()
             self.minitel.disableKeyboard()
             self.minitel.setScreenPageMode()
@@ -74,8 +73,9 @@ class ClientHandler():
             self.bind()
             self.minitel.enableKeyboard()
 
-            while not self.srv_ctx.disconnected and self.minitel:
-                self.minitel.readKeyboard(1)
+            while not self.srv_ctx.disconnected and not self.session.stopped():
+                if self.minitel.readKeyboard(1) < 0:
+                    self.srv_ctx.disconnected = True
 
     def print_message(self, text: str = '', level: PopupLevel = PopupLevel.INFO):
         self.minitel.send(Layout.setCursorPosition(12, 5))
@@ -101,24 +101,25 @@ class ClientHandler():
         self.srv_ctx.disconnected = True
 
     def callback_refresh_page(self):
-        self.minitel.clear()
-        self.minitel.setScreenPageMode()
-        self.minitel.setVideoMode(Mode.VIDEOTEX)
-        self.minitel.send(self.page)
+        with self.minitel.batch():
+            self.minitel.clear()
+            self.minitel.setScreenPageMode()
+            self.minitel.setVideoMode(Mode.VIDEOTEX)
+            self.minitel.send(self.page, shadowed=False)
 
-        if not self.srv_ctx.is_code_else_ip:
-            self.minitel.send(Layout.setCursorPosition(10,1))
-            self.minitel.setTextAttributes(inverted=False)
-            self.minitel.print('CODE|')
-            self.minitel.setTextAttributes(inverted=True)
-            self.minitel.print('IP')
-            self.minitel.setTextAttributes(inverted=False)
+            if not self.srv_ctx.is_code_else_ip:
+                self.minitel.send(Layout.setCursorPosition(10,1))
+                self.minitel.setTextAttributes(inverted=False)
+                self.minitel.print('CODE|')
+                self.minitel.setTextAttributes(inverted=True)
+                self.minitel.print('IP')
+                self.minitel.setTextAttributes(inverted=False)
 
-        self.minitel.send(Layout.setCursorPosition(10, 10))
-        if len(self.srv_ctx.prompt):
-            self.minitel.print(self.srv_ctx.prompt)
+            self.minitel.send(Layout.setCursorPosition(10, 10))
+            if len(self.srv_ctx.prompt):
+                self.minitel.print(self.srv_ctx.prompt)
         
-        self.minitel.beep()
+            self.minitel.beep()
 
     def callback_send(self):
         self.minitel.disableKeyboard()
@@ -131,8 +132,7 @@ class ClientHandler():
                 self.print_message('SERVICE FOUND ')
                 service = SERVICES[self.srv_ctx.prompt.lower()](self.minitel)
                 self.minitel.clearBindings()
-                service.start()
-                service.join()
+                self.session.runPage(service)
                 self.minitel.disableKeyboard()
                 self.minitel.clearBindings()
                 self.callback_refresh_page()
@@ -158,8 +158,7 @@ class ClientHandler():
         self.minitel.disableKeyboard()
         self.minitel.clearBindings()
         service = GuidePage(self.minitel)
-        service.start()
-        service.join()
+        self.session.runPage(service)
         self.minitel.disableKeyboard()
         self.minitel.clearBindings()
         self.callback_refresh_page()
@@ -224,15 +223,13 @@ class ClientHandler():
         self.minitel.bind(FilterKeyboardCode.Any_Keys, callback=self.callback_any)
         self.minitel.bind(FilterKeyboardCode.Printable_Keys, callback=self.callback_printable)
 
-def on_new_client(client_socket, addr, srv_ctx):
-    logging.log(level=logging.DEBUG, msg='on new client thread started: id ' + str(_thread.get_native_id()))
-    logging.log(level=logging.INFO, msg="New client: " + str(addr))
+def on_new_client(session: Session):
+    logging.log(level=logging.INFO, msg="New client: " + str(session.address))
 
-    client = ClientHandler(client_socket=client_socket, srv_ctx=srv_ctx)
+    client = ClientHandler(session=session, srv_ctx=ServiceContext())
     client.handle()
 
-    client_socket.close()
-    logging.log(level=logging.INFO, msg="client disconnected: " + str(addr))
+    logging.log(level=logging.INFO, msg="client disconnected: " + str(session.address))
 
 def main() -> int:
 
@@ -242,22 +239,16 @@ def main() -> int:
     port = 8083
 
     try:
-        xenas_socket = socket.socket()
-        xenas_socket.bind((host, port))
+        server = MinitelServer(on_new_client, host=host, port=port, max_sessions=32, backlog=16)
+        # Pages generated again are sent from the next draw on, without restarting
+        RESSOURCES.watch()
 
         logging.log(level=logging.INFO, msg='Server started')
         logging.log(level=logging.INFO, msg='Waiting for clients...')
 
-        xenas_socket.listen()
-        # xenas_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-        while True:
-            c, addr = xenas_socket.accept()
-            _thread.start_new_thread(on_new_client, (c, addr, ServiceContext()))
+        server.serveForever()
     except Exception as e:
         logging.log(level=logging.ERROR, msg='Server caught Exception: ' + str(e))
-    finally:
-        xenas_socket.close()
         logging.log(level=logging.ERROR, msg='Server stopped')
         return -1
     
@@ -1,6 +1,5 @@
 from enum import Enum
 from logging import *
-import copy
 
 ESC = b'\x1b'
 DELIMETER = b'\x20'    
@@ -44,8 +43,64 @@ END_LINEAGE = b'\x59'
 
 UNMASKING = b'\x5F'    
 
+# Interned attributes - Immutable instances shared by every cell holding the same values, compared by identity
+# Each one gets an id, its index in the states list, used by the transitions tables
+_semi_graphics_attributes_registry = {}
+_semi_graphics_attributes_states = []
+_text_attributes_registry = {}
+_text_attributes_states = []
+_zone_attributes_registry = {}
+_zone_attributes_states = []
+
+def _intern(attribute, registry: dict, states: list):
+    if getattr(attribute, '_interned', False):
+        return attribute
+
+    key = attribute._key()
+    interned = registry.get(key)
+    if interned is None:
+        interned = _clone(attribute)
+        object.__setattr__(interned, '_id', len(states))
+        object.__setattr__(interned, '_interned', True)
+        registry[key] = interned
+        states.append(interned)
+
+    return interned
+
+def _clone(attribute):
+    clone = type(attribute).__new__(type(attribute))
+    for name in type(attribute).__slots__:
+        if name != '_interned' and name != '_id':
+            object.__setattr__(clone, name, getattr(attribute, name))
+    return clone
+
+def _frozenSetattr(self, name, value):
+    if getattr(self, '_interned', False):
+        raise AttributeError('Interned ' + type(self).__name__ + ' is immutable')
+    object.__setattr__(self, name, value)
+
+def _keyEq(self, other):
+    if self is other:
+        return True
+    if type(self) is not type(other):
+        return NotImplemented
+    return self._key() == other._key()
+
+def _keyHash(self):
+    return hash(self._key())
+
+def _internedCopy(self):
+    if getattr(self, '_interned', False):
+        return self
+    return _clone(self)
+
+def _internedDeepcopy(self, memo):
+    return self.__copy__()
 
 class SemiGraphicsAttributes():
+
+    __slots__ = ('color', 'blinking', 'background', 'disjointed', '_interned', '_id')
+
     def __init__(self) -> None:
         self.color = CharacterColor.WHITE
         self.blinking = False
@@ -54,35 +109,43 @@ class SemiGraphicsAttributes():
 
     def setAttributes(self, color: CharacterColor = None, blinking: bool = None, background: BackgroundColor = None, disjointed: bool = None) -> bytes:
 
-        data = b''
-        
+        data = SemiGraphicsAttributes._toBytes(color=color, blinking=blinking, background=background, disjointed=disjointed)
+
         if color is not None:
-            data += ESC + color.value
             self.color = color
 
         if blinking is not None:
-            if blinking:
-                data += ESC + BLINKING
-                self.blinking = True
-            else:
-                data += ESC + FIXED
-                self.blinking = False
+            self.blinking = blinking
 
         if background is not None:
-            data += ESC + background.value
             self.background = background
 
         if disjointed is not None:
-            if disjointed:
-                data += ESC + START_LINEAGE
-                self.disjointed = True
-            else:
-                data += ESC + END_LINEAGE
-                self.disjointed = False
+            self.disjointed = disjointed
     
         return data
 
+    def _toBytes(color: CharacterColor = None, blinking: bool = None, background: BackgroundColor = None, disjointed: bool = None) -> bytes:
+        data = b''
+
+        if color is not None:
+            data += ESC + color.value
+
+        if blinking is not None:
+            data += ESC + (BLINKING if blinking else FIXED)
+
+        if background is not None:
+            data += ESC + background.value
+
+        if disjointed is not None:
+            data += ESC + (START_LINEAGE if disjointed else END_LINEAGE)
+
+        return data
+
     def diff(self, new: "SemiGraphicsAttributes") -> bytes:
+        if self is new:
+            return b''
+
         color = None
         blinking = None
         background = None
@@ -100,11 +163,38 @@ class SemiGraphicsAttributes():
         if self.disjointed != new.disjointed:
             disjointed = new.disjointed
         
-        dump_zone = copy.deepcopy(self)
-        return dump_zone.setAttributes(color=color, blinking=blinking, background=background, disjointed=disjointed)
+        return SemiGraphicsAttributes._toBytes(color=color, blinking=blinking, background=background, disjointed=disjointed)
+
+    def _absolute(self) -> bytes:
+        return SemiGraphicsAttributes._toBytes(color=self.color, blinking=self.blinking, background=self.background, disjointed=self.disjointed)
+
+    def _key(self) -> tuple:
+        return self.color, self.blinking, self.background, self.disjointed
+
+    def intern(self) -> "SemiGraphicsAttributes":
+        '''
+        Returns the shared immutable instance holding the same attributes.
+        '''
+        return _intern(self, _semi_graphics_attributes_registry, _semi_graphics_attributes_states)
+
+    def withAttributes(self, **attributes) -> "SemiGraphicsAttributes":
+        '''
+        Returns the interned instance of these attributes updated by setAttributes' arguments, self is left untouched.
+        '''
+        attribute = _clone(self)
+        attribute.setAttributes(**attributes)
+        return attribute.intern()
+
+    __setattr__ = _frozenSetattr
+    __eq__ = _keyEq
+    __hash__ = _keyHash
+    __copy__ = _internedCopy
+    __deepcopy__ = _internedDeepcopy
 
 class TextAttributes():
 
+    __slots__ = ('color', 'blinking', 'inverted', 'double_height', 'double_width', '_interned', '_id')
+
     def __init__(self) -> None:
         self.color = CharacterColor.WHITE
         self.blinking = False
@@ -114,60 +204,66 @@ class TextAttributes():
 
     def setAttributes(self, color: CharacterColor = None, blinking: bool = None, inverted = None, double_height: bool = None, double_width: bool = None) -> bytes:
 
-        data = b''
+        data = TextAttributes._toBytes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)
         
         if color is not None:
-            data += ESC + color.value
             self.color = color
 
         if blinking is not None:
-            if blinking:
-                data += ESC + BLINKING
-                self.blinking = True
-            else:
-                data += ESC + FIXED
-                self.blinking = False
+            self.blinking = blinking
 
         if inverted is not None:
-            if inverted:
-                data += ESC + INVERTED_BACKGROUND
-                self.inverted = True
-            else:
-                data += ESC + NORMAL_BACKGROUND
-                self.inverted = False
+            self.inverted = inverted
 
         if double_height is not None or double_width is not None:
             if double_width == double_height:
-                if double_height:
-                    data += ESC + DOUBLE_SIZE
-                    self.double_height = True
-                    self.double_width = True
-                else:
-                    data += ESC + NORMAL_SIZE
-                    self.double_height = False
-                    self.double_width = False
+                self.double_height = double_height
+                self.double_width = double_width
             else:
                 if double_height is not None and not double_height or double_width is not None and not double_width:
-                        data += ESC + NORMAL_SIZE
                         if double_width is not None and not double_width:
                             self.double_width = False
                         else:
                             self.double_height = False
                 if double_height:
-                    data += ESC + DOUBLE_HEIGHT
                     self.double_height = True
                 if double_width:
-                    data += ESC + DOUBLE_WIDTH
                     self.double_width = True
 
         return data
+
+    def _toBytes(color: CharacterColor = None, blinking: bool = None, inverted = None, double_height: bool = None, double_width: bool = None) -> bytes:
+        data = b''
+
+        if color is not None:
+            data += ESC + color.value
+
+        if blinking is not None:
+            data += ESC + (BLINKING if blinking else FIXED)
+
+        if inverted is not None:
+            data += ESC + (INVERTED_BACKGROUND if inverted else NORMAL_BACKGROUND)
+
+        if double_height is not None or double_width is not None:
+            if double_width == double_height:
+                data += ESC + (DOUBLE_SIZE if double_height else NORMAL_SIZE)
+            else:
+                if double_height is not None and not double_height or double_width is not None and not double_width:
+                        data += ESC + NORMAL_SIZE
+                if double_height:
+                    data += ESC + DOUBLE_HEIGHT
+                if double_width:
+                    data += ESC + DOUBLE_WIDTH
+
+        return data
     
     def diff(self, new: "TextAttributes") -> bytes:
+        if self is new:
+            return b''
+
         color = None
         blinking = None
         inverted = None
-        double_height = None
-        double_width = None
 
         if self.color != new.color:
             color = new.color
@@ -178,45 +274,81 @@ class TextAttributes():
         if self.inverted != new.inverted:
             inverted = new.inverted
         
-        if self.double_height != new.double_height:
-            print('HEIGHT DIFFERENT')
-            double_height = new.double_height
+        data = TextAttributes._toBytes(color=color, blinking=blinking, inverted=inverted)
+
+        # Size codes are absolute, a single one sets both dimensions
+        if self.double_height != new.double_height or self.double_width != new.double_width:
+            if new.double_height and new.double_width:
+                data += ESC + DOUBLE_SIZE
+            elif new.double_height:
+                data += ESC + DOUBLE_HEIGHT
+            elif new.double_width:
+                data += ESC + DOUBLE_WIDTH
+            else:
+                data += ESC + NORMAL_SIZE
 
-        if self.double_width != new.double_width:
-            double_width = new.double_width
-        
-        dump_zone = copy.deepcopy(self)
-        return dump_zone.setAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)
+        return data
+
+    def _absolute(self) -> bytes:
+        return TextAttributes._toBytes(color=self.color, blinking=self.blinking, inverted=self.inverted, double_height=self.double_height, double_width=self.double_width)
+
+    def _key(self) -> tuple:
+        return self.color, self.blinking, self.inverted, self.double_height, self.double_width
+
+    def intern(self) -> "TextAttributes":
+        '''
+        Returns the shared immutable instance holding the same attributes.
+        '''
+        return _intern(self, _text_attributes_registry, _text_attributes_states)
+
+    def withAttributes(self, **attributes) -> "TextAttributes":
+        '''
+        Returns the interned instance of these attributes updated by setAttributes' arguments, self is left untouched.
+        '''
+        attribute = _clone(self)
+        attribute.setAttributes(**attributes)
+        return attribute.intern()
+
+    __setattr__ = _frozenSetattr
+    __eq__ = _keyEq
+    __hash__ = _keyHash
+    __copy__ = _internedCopy
+    __deepcopy__ = _internedDeepcopy
 
 class ZoneAttributes():
 
+    __slots__ = ('background', 'masking', 'highlight', '_interned', '_id')
+
     def __init__(self) -> None:
         self.background = BackgroundColor.BLACK
         self.masking = False
         self.highlight = False
 
     def setAttributes(self, color: BackgroundColor = None, masking: bool = None, highlight: bool = None) -> bytes:
+        data = ZoneAttributes._toBytes(color=color, masking=masking, highlight=highlight)
+
+        if color is not None:
+            self.background = color
+
+        if masking is not None:
+            self.masking = masking
+        
+        if highlight is not None:
+            self.highlight = highlight
+
+        return data
+
+    def _toBytes(color: BackgroundColor = None, masking: bool = None, highlight: bool = None) -> bytes:
         data = b''
 
         if color is not None:
             data += ESC + color.value
-            self.background = color
 
         if masking is not None:
-            if masking:
-                data += ESC + MASKING
-                self.masking = True
-            else:
-                data += ESC + UNMASKING
-                self.masking = False
+            data += ESC + (MASKING if masking else UNMASKING)
         
         if highlight is not None:
-            if highlight:
-                data += ESC + START_HIGHLIGHTING
-                self.highlight = True
-            else:
-                data += ESC + END_HIGHLIGHTING
-                self.highlight = False
+            data += ESC + (START_HIGHLIGHTING if highlight else END_HIGHLIGHTING)
 
         if len(data):
             data += DELIMETER
@@ -224,6 +356,9 @@ class ZoneAttributes():
         return data
     
     def diff(self, new: "ZoneAttributes") -> bytes:
+        if self is new:
+            return b''
+
         background = None
         highlight = None
         masking = None
@@ -237,8 +372,80 @@ class ZoneAttributes():
         if self.masking != new.masking:
             masking = new.masking
         
-        dump_zone = copy.deepcopy(self)
-        return dump_zone.setAttributes(color=background, masking=masking, highlight=highlight)
-
-
-
+        return ZoneAttributes._toBytes(color=background, masking=masking, highlight=highlight)
+
+    def _absolute(self) -> bytes:
+        return ZoneAttributes._toBytes(color=self.background, masking=self.masking, highlight=self.highlight)
+
+    def _key(self) -> tuple:
+        return self.background, self.masking, self.highlight
+
+    def intern(self) -> "ZoneAttributes":
+        '''
+        Returns the shared immutable instance holding the same attributes.
+        '''
+        return _intern(self, _zone_attributes_registry, _zone_attributes_states)
+
+    def withAttributes(self, **attributes) -> "ZoneAttributes":
+        '''
+        Returns the interned instance of these attributes updated by setAttributes' arguments, self is left untouched.
+        '''
+        attribute = _clone(self)
+        attribute.setAttributes(**attributes)
+        return attribute.intern()
+
+    __setattr__ = _frozenSetattr
+    __eq__ = _keyEq
+    __hash__ = _keyHash
+    __copy__ = _internedCopy
+    __deepcopy__ = _internedDeepcopy
+
+
+class AttributesTransitions():
+    '''
+    Lookup table of the escape sequences turning an interned attributes state into another one.
+    The table holds every state of the attributes class, its rows are all computed when it is built (see _internAll).
+    '''
+
+    def __init__(self, states: list) -> None:
+        self.states = states
+        self._absolutes = [state._absolute() for state in states]
+        self._rows = [[current.diff(state) for state in states] for current in states]
+
+    def get(self, current, new) -> bytes:
+        '''
+        Get the sequence from "current" to "new", both interned.
+
+            Parameters:
+                current: Attributes in effect - When None the state is unknown and every attribute of "new" is sent
+                new: Attributes to set
+
+            Returns:
+                The escape sequence, empty if both are the same
+        '''
+        if new._id >= len(self._absolutes) or current is not None and current._id >= len(self._rows):
+            # Interned after the table was built
+            return new._absolute() if current is None else current.diff(new)
+
+        if current is None:
+            return self._absolutes[new._id]
+
+        return self._rows[current._id][new._id]
+
+def _internAll(cls, states: list, **values) -> AttributesTransitions:
+    # Interning every combination of the given values keeps ids dense and tables complete, the table is then built whole
+    names = list(values)
+    def walk(attribute, i):
+        if i == len(names):
+            attribute.intern()
+            return
+        for value in values[names[i]]:
+            object.__setattr__(attribute, names[i], value)
+            walk(attribute, i + 1)
+    walk(cls(), 0)
+
+    return AttributesTransitions(states)
+
+SEMI_GRAPHICS_TRANSITIONS = _internAll(SemiGraphicsAttributes, _semi_graphics_attributes_states, color=list(CharacterColor), blinking=[False, True], background=list(BackgroundColor), disjointed=[False, True])
+TEXT_TRANSITIONS = _internAll(TextAttributes, _text_attributes_states, color=list(CharacterColor), blinking=[False, True], inverted=[False, True], double_height=[False, True], double_width=[False, True])
+ZONE_TRANSITIONS = _internAll(ZoneAttributes, _zone_attributes_states, background=list(BackgroundColor), masking=[False, True], highlight=[False, True])
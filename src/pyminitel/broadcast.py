@@ -0,0 +1,77 @@
+from pyminitel.minitel import Minitel
+
+from threading import Lock
+from logging import log, ERROR, DEBUG
+
+
+class BroadcastHub:
+    '''
+    Publish/subscribe hub sending the same update to every Minitel subscribed to a topic, e.g. a page shown by many sessions.
+    An update is rendered once per Visualization Module and the same bytes are queued on each subscriber's Comm.
+    A subscriber whose Comm is behind by more than max_pending bytes skips the update, it gets the next one.
+    '''
+
+    def __init__(self, max_pending: int = 4096):
+        '''
+        BroadcastHub's constructor.
+
+            Parameters:
+                max_pending (int): Bytes a subscriber may have queued and still get an update - Default 4096
+        '''
+        self._max_pending = max_pending
+        self._lock = Lock()
+        # Subscribers by topic, replaced rather than modified so publish iterates without holding the lock
+        self._topics = {}
+
+    def subscribe(self, topic: str, minitel: Minitel):
+        with self._lock:
+            subscribers = self._topics.get(topic, ())
+            if minitel not in subscribers:
+                self._topics[topic] = subscribers + (minitel,)
+
+    def unsubscribe(self, topic: str, minitel: Minitel):
+        with self._lock:
+            subscribers = tuple(subscriber for subscriber in self._topics.get(topic, ()) if subscriber is not minitel)
+            if subscribers:
+                self._topics[topic] = subscribers
+            else:
+                self._topics.pop(topic, None)
+
+    def getSubscriberCount(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def publish(self, topic: str, render) -> int:
+        '''
+        Send an update to the topic's subscribers.
+
+            Parameters:
+                topic (str): Topic the update is about
+                render (Callable[[VisualizationModule], bytes]): Renders the update for a Visualization Module, called once
+                                                                 per Visualization Module among the subscribers' - The bytes
+                                                                 should position themselves and leave G0 selected
+
+            Returns:
+                count (int): Number of subscribers the update was queued for
+        '''
+        streams = {}
+        count = 0
+        for minitel in self._topics.get(topic, ()):
+            if minitel.getPendingSize() > self._max_pending:
+                log(DEBUG, 'Subscriber ' + str(id(minitel)) + ' of ' + topic + ' is behind, update skipped')
+                continue
+
+            vm = minitel.getVisualizationModule()
+            if vm not in streams:
+                try:
+                    streams[vm] = bytes(render(vm))
+                except Exception as e:
+                    log(ERROR, 'Unable to render ' + topic + ' - ' + str(e))
+                    return count
+
+            if minitel.post(streams[vm]):
+                # Its connection is lost
+                self.unsubscribe(topic, minitel)
+            else:
+                count += 1
+
+        return count
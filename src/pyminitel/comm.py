@@ -1,12 +1,13 @@
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from abc import ABCMeta, abstractmethod
 from logging import log, ERROR, DEBUG
 from queue import Queue, Empty
 
 from serial import Serial, SerialException, SerialTimeoutException
-from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR
+from selectors import DefaultSelector, EVENT_READ
 
-import time
+import asyncio, time, re
 
 class CommException(Exception):
     pass
@@ -14,8 +15,86 @@ class CommException(Exception):
 class MinitelDisconnectedException(Exception):
     pass
 
+class Pacer:
+    '''
+    Token bucket releasing bytes at the link's rate, sleeping until the Minitel can take them instead of polling.
+    Slow commands (clear, erase, line insertion and deletion) are followed by the time the Minitel needs to process them.
+    '''
+
+    # Estimated processing time (s) of the slow commands, by final byte
+    SLOW_COMMANDS = {
+        b'\x0c': 0.05,     # FF - Clear
+        b'J': 0.05,         # CSI J - Erase in display
+        b'L': 0.02,         # CSI L - Insert lines
+        b'M': 0.02,         # CSI M - Delete lines
+    }
+
+    __slow = re.compile(rb'\x0c|\x1b\[[0-9;]*[JLM]')
+
+    def __init__(self, baudrate: int = 1200, bits_per_character: int = 10, burst: int = 16):
+        '''
+        Pacer's constructor.
+
+            Parameters:
+                baudrate (int): Link's rate (300, 1200 or 4800)
+                bits_per_character (int): Bits sent per character - Default is 10 (7E1 with its start bit)
+                burst (int): Characters allowed ahead of the link, waiting in the OS buffers
+        '''
+        self._bits_per_character = bits_per_character
+        self._burst = burst
+        self.setBaudrate(baudrate)
+
+        # Time at which the link has sent everything
+        self._free_at = time.monotonic()
+        # Time at which the Minitel has processed the last slow command, the burst doesn't cover it
+        self._processed_at = self._free_at
+
+    def getBaudrate(self) -> int:
+        return self._baudrate
+
+    def setBaudrate(self, baudrate: int):
+        self._baudrate = baudrate
+        self._character = self._bits_per_character / baudrate
+
+    def write(self, data: bytes, write) -> None:
+        '''
+        Write data at the link's rate.
+
+            Parameters:
+                data (bytes): Bytes to write
+                write (Callable[[bytes], Any]): Writes bytes to the link, e.g. Serial.write or socket.sendall
+        '''
+        start = 0
+        for match in self.__slow.finditer(data):
+            self._write(data[start:match.end()], write, self.SLOW_COMMANDS[match.group()[-1:]])
+            start = match.end()
+
+        if start < len(data):
+            self._write(data[start:], write, 0)
+
+    def _write(self, data: bytes, write, processing: float):
+        # Written by slices keeping at most burst characters ahead of the link, none before a slow command is processed
+        for start in range(0, len(data), self._burst):
+            chunk = data[start:start + self._burst]
+            ready_at = max(self._free_at - (self._burst - len(chunk)) * self._character, self._processed_at)
+            wait = ready_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            write(chunk)
+
+            self._free_at = max(self._free_at, time.monotonic()) + len(chunk) * self._character
+
+        if processing:
+            self._processed_at = self._free_at + processing
+
 class Comm(Thread, metaclass=ABCMeta):
 
+    # Pending messages are gathered into one write, up to this many bytes
+    COALESCE_SIZE = 1024
+    # Delay (s) given to a burst of sends to complete before writing it
+    COALESCE_DELAY = 0.004
+
     def __init__(self):
 
         _out_messages = None
@@ -23,6 +102,9 @@ class Comm(Thread, metaclass=ABCMeta):
 
         self.__stop_event = Event()
         self._out_messages = Queue()
+        # Bytes put and not written yet
+        self._pending_size = 0
+        self._pending_lock = Lock()
 
         log(level=DEBUG, msg='Event object: id ' + str(id(self.__stop_event)))
         log(level=DEBUG, msg='Queue object: id ' + str(id(self._out_messages)))
@@ -33,6 +115,8 @@ class Comm(Thread, metaclass=ABCMeta):
             log(ERROR, 'Thread stopped - cannot put message')
             raise CommException
         
+        with self._pending_lock:
+            self._pending_size += len(data)
         self._out_messages.put(data)
     
     def stop(self):
@@ -41,6 +125,9 @@ class Comm(Thread, metaclass=ABCMeta):
     def stopped(self):
         return self.__stop_event.is_set()
 
+    def getPendingSize(self) -> int:
+        return self._pending_size
+
     def getTimeout(self) -> int:
         return self._timeout
     
@@ -48,11 +135,46 @@ class Comm(Thread, metaclass=ABCMeta):
         self._timeout = timeout
 
     def flush(self):
+        # Dropping the pending messages, marked done as no write will follow
         try:
             while True:
-                self._out_messages.get_nowait()
+                data = self._out_messages.get_nowait()
+                self._done(1, len(data))
         except Empty:
             pass
+
+    def _gather(self, timeout: float = 1) -> tuple:
+        '''
+        Wait for a message then gather the ones following it, until COALESCE_SIZE bytes or COALESCE_DELAY are reached
+        - Raises Empty if no message came before timeout.
+
+            Returns:
+                data (bytes): The messages' concatenation
+                count (int): Number of messages gathered, to be marked done once written
+        '''
+        data = bytearray(self._out_messages.get(timeout=timeout, block=True))
+        count = 1
+
+        deadline = time.monotonic() + self.COALESCE_DELAY
+        while len(data) < self.COALESCE_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    data += self._out_messages.get(timeout=remaining, block=True)
+                else:
+                    data += self._out_messages.get_nowait()
+            except Empty:
+                break
+            count += 1
+
+        return bytes(data), count
+
+    def _done(self, count: int, size: int):
+        # Once the count messages gathered, size bytes, are written
+        with self._pending_lock:
+            self._pending_size -= size
+        for _ in range(count):
+            self._out_messages.task_done()
     
     @abstractmethod
     def open(self):
@@ -66,18 +188,25 @@ class Comm(Thread, metaclass=ABCMeta):
     def read(self, n = int) -> bytes:
         pass
 
+    def readBuffered(self) -> bytes:
+        '''
+        Read the bytes already received without waiting, e.g. keys typed ahead - Default reads none.
+        '''
+        return b''
+
     @abstractmethod
     def run(self):
         pass
 
 class CommSerial(Comm):
 
-    __safeWriting = None
+    __pacer = None
 
     def __init__(self, port: str, baudrate: int = 1200, safe_writing: bool = False, timeout: float = None):
         self.__ser = Serial(port=port, baudrate=baudrate, bytesize=7, parity='E', stopbits=1)
         self.__ser.flush()
-        self.__safeWriting = safe_writing
+        if safe_writing:
+            self.__pacer = Pacer(baudrate)
         self.setTimeout(timeout=timeout)
         super().__init__()
 
@@ -93,6 +222,14 @@ class CommSerial(Comm):
             log(ERROR, str(e))
             raise CommException
 
+    def readBuffered(self) -> bytes:
+        try:
+            waiting = self.__ser.in_waiting
+            return self.__ser.read(waiting) if waiting else b''
+        except SerialException as e:
+            log(ERROR, str(e))
+            raise CommException
+
     def open(self):
         try: 
             self.__ser.open()
@@ -119,13 +256,11 @@ class CommSerial(Comm):
         return self.__ser.baudrate
 
     def setBaudrate(self, baudrate: int):
-        try:
-            while True:
-                self._out_messages.get_nowait()
-        except Empty:
-            pass
+        Comm.flush(self)
         self.close()
         self.__ser.baudrate = baudrate
+        if self.__pacer:
+            self.__pacer.setBaudrate(baudrate)
         
         self.open()
 
@@ -135,16 +270,15 @@ class CommSerial(Comm):
         run = True
         while run:
             try:
-                queued_data = self._out_messages.get(timeout=1, block=True)
+                queued_data, count = self._gather()
                 try:
-                    n = self.__ser.write(queued_data)
-                    if self.__safeWriting:
-                        time.sleep((n * 12 )/ self.__ser.baudrate)
-                        while self.__ser.out_waiting:
-                            pass
-                    self._out_messages.task_done()
+                    if self.__pacer:
+                        self.__pacer.write(queued_data, self.__ser.write)
+                    else:
+                        self.__ser.write(queued_data)
                 except SerialTimeoutException:
                     log(ERROR, 'Write timeout exceeded, will retry on next loop')
+                self._done(count, len(queued_data))
             except Empty:
                 if self.stopped():
                     run = False
@@ -153,9 +287,18 @@ class CommSocket(Comm):
 
     __socket = None
     __tcp = None
+    __pacer = None
+    __selector = None
+
+    # Bytes asked to each recv, what is not read yet stays buffered
+    RECEIVE_SIZE = 4096
 
-    def __init__(self, host: int, port: str, timeout: float = None, tcp: socket = None):
+    def __init__(self, host: int, port: str, timeout: float = None, tcp: socket = None, baudrate: int = None):
         self.setTimeout(timeout=timeout)
+        self.__received = bytearray()
+        # Paced at the Minitel's rate when given, for bridges forwarding to its serial port without flow control
+        if baudrate:
+            self.__pacer = Pacer(baudrate)
         if not tcp:
             self.__socket = socket(AF_INET, SOCK_STREAM)
             self.__socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
@@ -173,23 +316,55 @@ class CommSocket(Comm):
             del self.__socket
 
     def read(self, n = int):
-        try:
-            self.__tcp.settimeout(self.getTimeout())
-            got = 0
-            data_got = b''
-            data = b''
-            while got < n:
-                data_got = self.__tcp.recv(n)
-                if data_got is None:
-                    raise MinitelDisconnectedException()
-                got += len(data_got)
-                data += data_got
-            self.__tcp.settimeout(None)
-            return data
-        except TimeoutError as e:
-            # log(level=DEBUG, msg="Timeout caught: " + str(e) + ", returning b''")
+        if not self.__fill(n):
+            return b''
+
+        data = bytes(self.__received[:n])
+        del self.__received[:n]
+        return data
+
+    def readBuffered(self) -> bytes:
+        data = bytes(self.__received)
+        self.__received.clear()
+        return data
+
+    def peek(self, n = int) -> bytes:
+        '''
+        Like read, without consuming the bytes returned.
+        '''
+        if not self.__fill(n):
             return b''
 
+        return bytes(self.__received[:n])
+
+    def __fill(self, n: int) -> bool:
+        # Receive in large chunks until n bytes are buffered, False if the timeout is reached first
+        # The socket stays blocking (the writer thread shares it), a selector waits for the deadline: unlike select, it
+        # takes file descriptors above FD_SETSIZE, which a server's sessions reach
+        timeout = self.getTimeout()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while len(self.__received) < n:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                if self.__selector is None:
+                    self.__selector = DefaultSelector()
+                    self.__selector.register(self.__tcp, EVENT_READ)
+                if not self.__selector.select(remaining):
+                    return False
+                data = self.__tcp.recv(self.RECEIVE_SIZE)
+            except (OSError, ValueError) as e:
+                # ValueError once the socket or the selector is closed
+                log(ERROR, 'Connection lost - ' + str(e))
+                raise CommException
+
+            if not data:
+                log(ERROR, 'Connection closed by peer')
+                raise CommException
+            self.__received += data
+
+        return True
+
     def open(self):
         if self.__socket:
             try: 
@@ -202,7 +377,14 @@ class CommSocket(Comm):
 
     def close(self):
         if self.__tcp:
+            # Wakes up a thread waiting for the input, close alone doesn't
+            try:
+                self.__tcp.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
             self.__tcp.close()
+        if self.__selector:
+            self.__selector.close()
         if self.__socket:
             self.__socket.close()
 
@@ -212,17 +394,111 @@ class CommSocket(Comm):
     def setTimeout(self, timeout: int = None):
         super().setTimeout(timeout=timeout)
 
+    def getBaudrate(self) -> int:
+        return self.__pacer.getBaudrate() if self.__pacer else None
+
+    def setBaudrate(self, baudrate: int = None):
+        # Rate the writes are paced at, e.g. once the bridge's serial port follows the Minitel's - None stops pacing them
+        if not baudrate:
+            self.__pacer = None
+        elif self.__pacer:
+            self.__pacer.setBaudrate(baudrate)
+        else:
+            self.__pacer = Pacer(baudrate)
+
     def run(self):
         run = True
         while run:
             try:
-                queued_data = self._out_messages.get(timeout=1, block=True)
-                self.__tcp.sendall(queued_data)
-                self._out_messages.task_done()
+                queued_data, count = self._gather()
             except Empty:
                 if self.stopped():
                     run = False
+                continue
+
+            try:
+                if self.__pacer:
+                    self.__pacer.write(queued_data, self.__tcp.sendall)
+                else:
+                    self.__tcp.sendall(queued_data)
             except Exception as e:
                 log(ERROR, str(e))
                 self.stop()
                 run = False
+            self._done(count, len(queued_data))
+
+        # Nothing is written anymore, the messages left are dropped
+        self.flush()
+
+class AsyncCommSocket():
+    '''
+    Comm over asyncio streams, e.g. the ones given to asyncio.start_server's callback.
+    It needs no thread: put writes into the transport's buffer, drain waits for it to go below its high-water mark and read
+    awaits the answer.
+    '''
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = None, high_water: int = 16384):
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self._closed = False
+
+        # Bounding what is buffered per connection, drain blocks above
+        self._writer.transport.set_write_buffer_limits(high=high_water)
+
+    def put(self, data: bytes):
+        if self._closed or self._writer.is_closing():
+            log(ERROR, 'Socket closed - cannot put message')
+            raise CommException
+
+        self._writer.write(data)
+
+    async def drain(self):
+        try:
+            await self._writer.drain()
+        except ConnectionError as e:
+            log(ERROR, str(e))
+            raise CommException
+
+    async def read(self, n = int) -> bytes:
+        try:
+            return await asyncio.wait_for(self._reader.readexactly(n), self._timeout)
+        except asyncio.TimeoutError:
+            return b''
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            log(ERROR, 'Connection lost - ' + str(e))
+            raise CommException
+
+    def getPendingSize(self) -> int:
+        return self._writer.transport.get_write_buffer_size()
+
+    def readBuffered(self) -> bytes:
+        # The stream reader's buffer can only be awaited, the input is read as awaited
+        return b''
+
+    def getTimeout(self) -> int:
+        return self._timeout
+
+    def setTimeout(self, timeout: int = None):
+        self._timeout = timeout
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        self.close()
+
+    def stopped(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._writer.close()
+
+    async def waitClosed(self):
+        self.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -14,7 +14,15 @@ def get_connected_serial_minitel(port: str = None, ip: str = None, timeout: floa
         ports.append(port)
 
     for port in ports:
-        for bauds in [Minitel.ConnectorBaudrate.BAUDS_1200, Minitel.ConnectorBaudrate.BAUDS_4800, Minitel.ConnectorBaudrate.BAUDS_300]:
+        bauds_order = [Minitel.ConnectorBaudrate.BAUDS_1200, Minitel.ConnectorBaudrate.BAUDS_4800, Minitel.ConnectorBaudrate.BAUDS_300]
+
+        # Trying first the baudrate the Minitel answered at on its last connection
+        profile = Minitel.getProfile(port)
+        if profile is not None and ip is None and tcp is None:
+            bauds_order.remove(profile['baudrate'])
+            bauds_order.insert(0, profile['baudrate'])
+
+        for bauds in bauds_order:
             try:
                 return Minitel(port=port, baudrate=bauds, ip=ip, timeout=timeout, tcp=tcp)
             except MinitelException as e :
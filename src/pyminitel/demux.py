@@ -0,0 +1,267 @@
+from threading import Thread, Event, Lock
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from collections import deque
+from queue import Queue, Empty
+from enum import Enum
+from logging import log, ERROR, DEBUG
+
+from pyminitel.comm import Comm, CommException
+from pyminitel.keyboard import KEYBOARD_DECODER
+
+
+SOH = b'\x01'
+EOT = b'\x04'
+ESC = b'\x1b'
+SEP = b'\x13'
+US = b'\x1f'
+
+PRO1 = b'\x39'
+PRO2 = b'\x3a'
+PRO3 = b'\x3b'
+
+# Answer's length by PRO, its ESC included
+PRO_ANSWER_LENGTHS = { PRO1: 3, PRO2: 4, PRO3: 5 }
+
+
+class InputEvent(Enum):
+    ANSWER = 1          # PRO answer or ROM identification
+    SEPARATOR = 2       # SEP sequence not sent by the keyboard, e.g. an acknowledgement
+    KEY = 3
+    CURSOR = 4          # Cursor position report
+
+
+class InputDemux(Thread):
+    '''
+    Reads the Minitel's input continuously and splits it into events: keys are queued while protocol answers resolve
+    the oldest query's future expecting their kind, e.g. a PRO2 status or a cursor position.
+    A key typed while a query waits for its answer no longer corrupts them, the events no query expects are queued with
+    the keys.
+    '''
+
+    def __init__(self, comm: Comm):
+        self._comm = comm
+        self._stop_event = Event()
+
+        self._keys = Queue()
+        # Input read and not framed yet
+        self._input = bytearray()
+
+        self._lock = Lock()
+        # (prefix, future) waiting for an answer starting with prefix, oldest first, and answers no future expected yet,
+        # e.g. received before their future was registered
+        self._futures = deque()
+        self._answers = deque()
+        # Set while readKey waits, the answers no future expects are then keys
+        self._reading_keys = False
+
+        super().__init__(daemon=True)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def expect(self, prefix: bytes = b'') -> Future:
+        '''
+        Register the future of a query's answer, to be called right after the query is sent.
+
+            Parameters:
+                prefix (bytes): Bytes the answer starts with, e.g. PRO2 and the answer's code - Default matches any answer
+
+            Returns:
+                future (Future): Resolved with the answer's bytes, None if the input is lost
+        '''
+        future = Future()
+        with self._lock:
+            for answer in self._answers:
+                if answer.startswith(prefix):
+                    self._answers.remove(answer)
+                    future.set_result(answer)
+                    return future
+
+            if self.stopped():
+                future.set_result(None)
+            else:
+                self._futures.append((prefix, future))
+        return future
+
+    def readAnswer(self, timeout: float = None, prefix: bytes = b'') -> bytes:
+        '''
+        Wait for a protocol answer.
+
+            Parameters:
+                timeout (float): Seconds to wait, None waits forever
+                prefix (bytes): Bytes the answer starts with - Default matches any answer
+
+            Returns:
+                answer (bytes): The answer, empty if the timeout is reached, None if the input is lost
+        '''
+        future = self.expect(prefix)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return b''
+
+    def discardAnswers(self):
+        # Before a new query is sent, the answers no query took are queued as keys, e.g. of queries which timed out
+        with self._lock:
+            while self._answers:
+                self._keys.put(self._answers.popleft())
+
+    def readKey(self, timeout: float = None) -> bytes:
+        '''
+        Wait for the next key.
+
+            Parameters:
+                timeout (float): Seconds to wait, None waits forever
+
+            Returns:
+                key (bytes): The key's sequence, empty if the timeout is reached
+        '''
+        with self._lock:
+            self._reading_keys = True
+            while self._answers:
+                self._keys.put(self._answers.popleft())
+        try:
+            return self._keys.get(timeout=timeout)
+        except Empty:
+            return b''
+        finally:
+            with self._lock:
+                self._reading_keys = False
+
+    def run(self):
+        while not self.stopped():
+            try:
+                events = self._readEvents()
+            except CommException:
+                log(ERROR, 'Input lost, stopping input demultiplexer')
+                self.stop()
+                break
+
+            for event, data in events:
+                log(DEBUG, 'Input ' + event.name + ': ' + data.hex())
+                if event == InputEvent.KEY:
+                    self._keys.put(data)
+                else:
+                    self._resolve(data)
+
+        # Queries still waiting would otherwise wait forever
+        with self._lock:
+            while self._futures:
+                _, future = self._futures.popleft()
+                if future.set_running_or_notify_cancel():
+                    future.set_result(None)
+
+    def _resolve(self, answer: bytes):
+        with self._lock:
+            for waiting in list(self._futures):
+                prefix, future = waiting
+                if future.cancelled() or answer.startswith(prefix):
+                    self._futures.remove(waiting)
+                    # Cancelled once its query timed out
+                    if answer.startswith(prefix) and future.set_running_or_notify_cancel():
+                        future.set_result(answer)
+                        return
+
+            if self._reading_keys:
+                self._keys.put(answer)
+            else:
+                self._answers.append(answer)
+
+    def _receive(self, timeout: bool = False) -> bool:
+        # Append the next byte read and whatever was received with it to the input, False if nothing came before the
+        # Comm's timeout - Waiting for it raises CommException once stopped, unless timeout is True
+        data = self._comm.read(1)
+        if data is None:
+            raise CommException
+        if not len(data):
+            if not timeout and self.stopped():
+                raise CommException
+            return False
+
+        self._input += data + self._comm.readBuffered()
+        return True
+
+    def _fill(self, n: int):
+        # Wait until the input holds n bytes, e.g. the rest of an answer
+        while len(self._input) < n:
+            self._receive()
+
+    def _take(self, n: int) -> bytes:
+        data = bytes(self._input[:n])
+        del self._input[:n]
+        return data
+
+    def _frameAnswer(self) -> tuple:
+        # Event and length of the protocol answer starting the input, (None, 0) if it starts with keys
+        first = self._input[0:1]
+
+        if first == SOH:
+            end = self._input.find(EOT)
+            while end < 0:
+                self._fill(len(self._input) + 1)
+                end = self._input.find(EOT)
+            return InputEvent.ANSWER, end + 1
+
+        if first == US:
+            return InputEvent.CURSOR, 3
+
+        if first == ESC or first == SEP:
+            self._fill(2)
+            if self._isAnswerAt(0):
+                if first == SEP:
+                    return InputEvent.SEPARATOR, 2
+                return InputEvent.ANSWER, PRO_ANSWER_LENGTHS[bytes(self._input[1:2])]
+
+        return None, 0
+
+    def _isAnswerAt(self, i: int) -> bool:
+        # True if a protocol answer starts at i, from the bytes received so far
+        first = self._input[i:i + 1]
+        following = bytes(self._input[i + 1:i + 2])
+
+        if first == SOH or first == US:
+            return True
+        if first == ESC:
+            return following in PRO_ANSWER_LENGTHS
+        if first == SEP:
+            # Function keys, other SEP sequences are sent by the Minitel's modules
+            return len(following) > 0 and not b'\x41' <= following <= b'\x49'
+        return False
+
+    def _readEvents(self) -> list:
+        # Frame the input read so far, [] if nothing came before the Comm's timeout
+        # Protocol answers are framed one by one, the keys up to the next answer are decoded at once
+        if not len(self._input) and not self._receive(timeout=True):
+            return []
+
+        events = []
+        while len(self._input):
+            event, length = self._frameAnswer()
+            if length:
+                self._fill(length)
+                events.append((event, self._take(length)))
+                continue
+
+            keys, rest = KEYBOARD_DECODER.decode(bytes(self._input))
+            if not keys:
+                # Reading on while the input ends with the start of a longer code
+                if not self._receive():
+                    keys, rest = KEYBOARD_DECODER.decode(rest, final=True)
+                    events += [(InputEvent.KEY, key) for key in keys]
+                    self._input.clear()
+                continue
+
+            # The keys decoded past the next answer's start are decoded again once it is framed
+            taken = 0
+            for key in keys:
+                if taken and self._isAnswerAt(taken):
+                    break
+                events.append((InputEvent.KEY, key))
+                taken += len(key)
+            del self._input[:taken]
+
+        return events
@@ -0,0 +1,713 @@
+from pyminitel.attributes import TextAttributes, ZoneAttributes, SemiGraphicsAttributes, CharacterColor, BackgroundColor
+from pyminitel.alphanumerical import inverted_G0, inverted_SC, inverted_VGP2, inverted_VGP5
+from pyminitel.comm import Comm
+from pyminitel.mode import Mode, RESOLUTION
+
+from threading import Thread, Condition
+from queue import Empty
+from socket import socket, AF_INET, SOCK_STREAM
+from logging import log, ERROR, WARNING, DEBUG
+
+import time
+
+NUL = 0x00
+BEL = 0x07
+BS = 0x08
+HT = 0x09
+LF = 0x0a
+VT = 0x0b
+FF = 0x0c
+CR = 0x0d
+SO = 0x0e
+SI = 0x0f
+CON = 0x11
+REP = 0x12
+SEP = 0x13
+COFF = 0x14
+CAN = 0x18
+SS2 = 0x19
+ESC = 0x1b
+RS = 0x1e
+US = 0x1f
+
+PRO1 = 0x39
+PRO2 = 0x3a
+PRO3 = 0x3b
+CSI = 0x5b
+
+# Second byte of SS2 sequences followed by the accentuated letter
+_ACCENTS = (0x41, 0x42, 0x43, 0x48, 0x4b)
+
+_CHARACTER_COLORS = {color.value[0]: color for color in CharacterColor}
+_BACKGROUND_COLORS = {color.value[0]: color for color in BackgroundColor}
+
+
+class TerminalState:
+    '''
+    Screen model of a Minitel 1B, updated from the bytes it receives.
+    Rows are numbered like the Minitel's, 0 being the status row, and hold zone attributes, text attributes (semi graphic
+    attributes for G1 characters) and characters like Videotex does - '' for a cell never written.
+    '''
+
+    def __init__(self, mode: Mode = Mode.VIDEOTEX) -> None:
+        self._roll = False
+        self._insert = False
+        self._cursor_visible = False
+        self._screen_masked = False
+
+        # Bytes of an incomplete sequence, kept until the next feed
+        self._pending = b''
+
+        self.setMode(mode)
+
+    def setMode(self, mode: Mode):
+        '''
+        Switch between the 40 columns Videotex mode and the 80 columns Mixed mode, clearing the screen.
+        '''
+        self._mode = mode
+        self._height = RESOLUTION[mode][0]
+        self._width = RESOLUTION[mode][1]
+
+        default_zone = ZoneAttributes().intern()
+        default_text = TextAttributes().intern()
+
+        self._zones = [[default_zone] * self._width for _ in range(self._height)]
+        self._texts = [[default_text] * self._width for _ in range(self._height)]
+        self._chars = [[''] * self._width for _ in range(self._height)]
+
+        self._r, self._c = 1, 1
+        self._saved = (1, 1)
+        self._resetAttributes()
+        self._last = None
+
+    def getMode(self) -> Mode:
+        return self._mode
+
+    def isRollMode(self) -> bool:
+        return self._roll
+
+    def setRollMode(self, roll: bool):
+        self._roll = roll
+
+    def cursor(self) -> tuple:
+        return self._r, self._c
+
+    def isCursorVisible(self) -> bool:
+        return self._cursor_visible
+
+    def isScreenMasked(self) -> bool:
+        return self._screen_masked
+
+    def isG1(self) -> bool:
+        return self._g1
+
+    def getTextAttributes(self) -> TextAttributes:
+        return self._text
+
+    def areAttributesKnown(self) -> bool:
+        '''
+        Returns False from forgetAttributes until the attributes are reset (FF, RS or US), as a shadow started on a screen
+        in an unknown state.
+        '''
+        return self._attributes_known
+
+    def forgetAttributes(self):
+        self._attributes_known = False
+
+    def row(self, r: int) -> tuple:
+        return self._zones[r], self._texts[r], self._chars[r]
+
+    def text(self, r: int) -> str:
+        '''
+        Characters displayed on the row r, blanks as spaces.
+        '''
+        return ''.join(char if len(char) else ' ' for char in self._chars[r])
+
+    def feed(self, data: bytes) -> bytes:
+        '''
+        Interpret the bytes received by the Minitel.
+
+            Parameters:
+                data (bytes): Bytes received, sequences may be split between calls
+
+            Returns:
+                answer (bytes): Bytes the Minitel sends back (answers to queries), empty if none
+        '''
+        data = self._pending + data
+        self._pending = b''
+
+        answer = b''
+        i = 0
+        while i < len(data):
+            n, out = self._sequence(data, i)
+            if n == 0:
+                self._pending = data[i:]
+                break
+            answer += out
+            i += n
+
+        return answer
+
+    def _protocol(self, sequence: bytes) -> bytes:
+        # PRO1, PRO2 and PRO3 sequences, a bare screen doesn't answer them
+        return b''
+
+    def _sequence(self, data: bytes, i: int) -> tuple:
+        # Interpret the sequence starting at data[i], returns its length (0 if incomplete) and the answer
+        b = data[i]
+        left = len(data) - i
+
+        if b >= 0x20:
+            if b == 0x7f and not self._g1:
+                # DEL is only displayed as a semi graphic character
+                self._put('█')
+            else:
+                self._put(self._decode(bytes([b])))
+            return 1, b''
+
+        if b == ESC:
+            if left < 2:
+                return 0, b''
+            return self._escape(data, i)
+
+        if b == SS2:
+            if left < 2:
+                return 0, b''
+            n = 2
+            if data[i + 1] in _ACCENTS:
+                if left < 3:
+                    return 0, b''
+                n = 3
+            if not self._g1:
+                self._put(self._decode(data[i:i + n]))
+            return n, b''
+
+        if b == US:
+            if left < 3:
+                return 0, b''
+            self._setPosition(data[i + 1] - 0x40, data[i + 2] - 0x40)
+            return 3, b''
+
+        if b == REP:
+            if left < 2:
+                return 0, b''
+            if self._last is not None:
+                for _ in range(data[i + 1] - 0x40):
+                    self._put(self._last)
+            return 2, b''
+
+        if b == BS:
+            self._moveLeft()
+        elif b == HT:
+            self._moveRight()
+        elif b == LF:
+            self._moveDown()
+        elif b == VT:
+            self._moveUp()
+        elif b == CR:
+            self._c = 1
+        elif b == FF:
+            for r in range(1, self._height):
+                self._erase(r, 0, self._width)
+            self._moveTo(1, 1)
+            self._resetAttributes()
+        elif b == RS:
+            self._moveTo(1, 1)
+            self._resetAttributes()
+        elif b == CAN:
+            self._fill(self._c - 1, self._width)
+        elif b == SO:
+            self._g1 = True
+        elif b == SI:
+            self._g1 = False
+        elif b == CON:
+            self._cursor_visible = True
+        elif b == COFF:
+            self._cursor_visible = False
+        elif b != NUL and b != BEL and b != SEP:
+            log(DEBUG, 'Ignoring control ' + hex(b))
+
+        return 1, b''
+
+    def _escape(self, data: bytes, i: int) -> tuple:
+        b = data[i + 1]
+        left = len(data) - i
+
+        if b == PRO1 or b == PRO2 or b == PRO3:
+            n = 3 + b - PRO1
+            if left < n:
+                return 0, b''
+            return n, self._protocol(data[i:i + n])
+
+        if b == CSI:
+            return self._csi(data, i)
+
+        if b == 0x23:
+            # Full screen masking: ESC 0x23 0x20 0x58/0x5f
+            if left < 4:
+                return 0, b''
+            self._screen_masked = data[i + 3] == 0x58
+            return 4, b''
+
+        if b == 0x61:
+            return 2, bytes([US, 0x40 + self._r, 0x40 + self._c])
+
+        if b in _CHARACTER_COLORS:
+            self._text = self._text.withAttributes(color=_CHARACTER_COLORS[b])
+            self._semi_graphics = self._semi_graphics.withAttributes(color=_CHARACTER_COLORS[b])
+        elif b == 0x48 or b == 0x49:
+            self._text = self._text.withAttributes(blinking=b == 0x48)
+            self._semi_graphics = self._semi_graphics.withAttributes(blinking=b == 0x48)
+        elif 0x4c <= b <= 0x4f:
+            self._text = self._text.withAttributes(double_height=b == 0x4d or b == 0x4f, double_width=b == 0x4e or b == 0x4f)
+        elif b in _BACKGROUND_COLORS:
+            if self._g1:
+                self._semi_graphics = self._semi_graphics.withAttributes(background=_BACKGROUND_COLORS[b])
+            else:
+                self._declared = self._declaration().withAttributes(color=_BACKGROUND_COLORS[b])
+        elif b == 0x58 or b == 0x5f:
+            self._declared = self._declaration().withAttributes(masking=b == 0x58)
+        elif b == 0x59 or b == 0x5a:
+            if self._g1:
+                self._semi_graphics = self._semi_graphics.withAttributes(disjointed=b == 0x5a)
+            else:
+                self._declared = self._declaration().withAttributes(highlight=b == 0x5a)
+        elif b == 0x5c or b == 0x5d:
+            self._text = self._text.withAttributes(inverted=b == 0x5d)
+        else:
+            log(DEBUG, 'Ignoring escape sequence ' + hex(b))
+
+        return 2, b''
+
+    def _csi(self, data: bytes, i: int) -> tuple:
+        j = i + 2
+        while j < len(data) and (0x30 <= data[j] <= 0x3f):
+            j += 1
+        if j == len(data):
+            return 0, b''
+
+        parameters = [int(p) if len(p) else 0 for p in data[i + 2:j].decode().replace('?', '').split(';')]
+        n = parameters[0] if parameters[0] else 1
+        final = data[j]
+
+        if final == 0x41:
+            self._moveTo(max(1, self._r - n), self._c)
+        elif final == 0x42:
+            self._moveTo(min(self._height - 1, self._r + n), self._c)
+        elif final == 0x43:
+            self._c = min(self._width, self._c + n)
+        elif final == 0x44:
+            self._c = max(1, self._c - n)
+        elif final == 0x48:
+            r = parameters[0] if parameters[0] else 1
+            c = parameters[1] if len(parameters) > 1 and parameters[1] else 1
+            self._moveTo(min(r, self._height - 1), min(c, self._width))
+        elif final == 0x4a:
+            if parameters[0] == 0:
+                self._erase(self._r, self._c - 1, self._width)
+                for r in range(self._r + 1, self._height):
+                    self._erase(r, 0, self._width)
+            elif parameters[0] == 1:
+                for r in range(1, self._r):
+                    self._erase(r, 0, self._width)
+                self._erase(self._r, 0, self._c)
+            else:
+                for r in range(1, self._height):
+                    self._erase(r, 0, self._width)
+        elif final == 0x4b:
+            if parameters[0] == 0:
+                self._erase(self._r, self._c - 1, self._width)
+            elif parameters[0] == 1:
+                self._erase(self._r, 0, self._c)
+            else:
+                self._erase(self._r, 0, self._width)
+        elif final == 0x50:
+            self._shift(self._c - 1, -n)
+        elif final == 0x40:
+            self._shift(self._c - 1, n)
+        elif final == 0x4d or final == 0x4c:
+            self._scroll(self._r, n if final == 0x4d else -n)
+        elif final == 0x68 or final == 0x6c:
+            self._insert = final == 0x68
+        else:
+            log(DEBUG, 'Ignoring CSI sequence ' + data[i:j + 1].hex())
+
+        return j + 1 - i, b''
+
+    def _decode(self, sequence: bytes) -> str:
+        if self._g1:
+            return sequence.decode()
+
+        for table in (inverted_G0, inverted_SC, inverted_VGP5, inverted_VGP2):
+            if sequence in table:
+                return table[sequence][0]
+
+        log(WARNING, 'Unable to decode ' + sequence.hex())
+        return '_'
+
+    def _resetAttributes(self):
+        self._attributes_known = True
+        self._g1 = False
+        self._text = TextAttributes().intern()
+        self._semi_graphics = SemiGraphicsAttributes().intern()
+        self._resetZone()
+
+    def _resetZone(self):
+        # Zone attributes are serial, validated by a space and reset on each row
+        self._zone = ZoneAttributes().intern()
+        self._declared = None
+
+    def _declaration(self) -> ZoneAttributes:
+        return self._declared if self._declared is not None else self._zone
+
+    def _put(self, char: str):
+        r, c = self._r, self._c - 1
+
+        if self._g1:
+            attribute = self._semi_graphics
+        else:
+            attribute = self._text
+            if char == ' ' and self._declared is not None:
+                self._zone = self._declared
+                self._declared = None
+
+        if self._insert:
+            self._shift(c, 1)
+
+        self._chars[r][c] = char
+        self._texts[r][c] = attribute
+        self._zones[r][c] = self._zone
+        self._last = char
+
+        width = 1
+        if not self._g1 and self._text.double_width and c + 1 < self._width:
+            width = 2
+            self._chars[r][c + 1] = ''
+            self._texts[r][c + 1] = attribute
+            self._zones[r][c + 1] = self._zone
+        if not self._g1 and self._text.double_height and r > 1:
+            for i in range(c, c + width):
+                self._chars[r - 1][i] = ''
+                self._texts[r - 1][i] = attribute
+                self._zones[r - 1][i] = self._zone
+
+        for _ in range(width):
+            self._moveRight()
+
+    def _fill(self, start: int, end: int):
+        for c in range(start, end):
+            self._chars[self._r][c] = ' '
+            self._texts[self._r][c] = self._text
+            self._zones[self._r][c] = self._zone
+
+    def _erase(self, r: int, start: int, end: int):
+        default_zone = ZoneAttributes().intern()
+        default_text = TextAttributes().intern()
+        for c in range(start, end):
+            self._chars[r][c] = ''
+            self._texts[r][c] = default_text
+            self._zones[r][c] = default_zone
+
+    def _shift(self, c: int, n: int):
+        # Characters from the column c moved n columns to the right (left if negative) on the cursor's row
+        blanks = (ZoneAttributes().intern(), TextAttributes().intern(), '')
+        for cells, blank in zip(self.row(self._r), blanks):
+            if n > 0:
+                cells[c:] = ([blank] * n + cells[c:])[:self._width - c]
+            else:
+                cells[c:] = cells[c - n:] + [blank] * min(-n, self._width - c)
+
+    def _scroll(self, r: int, n: int):
+        # Rows from r moved up by n rows (down if negative), rows brought in are blank
+        rows = list(range(r, self._height))
+        moved = [self.row(i) for i in rows]
+        moved = moved[n:] if n > 0 else [None] * -n + moved[:n]
+        moved += [None] * (len(rows) - len(moved))
+
+        for i, cells in zip(rows, moved):
+            if cells is None:
+                self._zones[i] = [ZoneAttributes().intern()] * self._width
+                self._texts[i] = [TextAttributes().intern()] * self._width
+                self._chars[i] = [''] * self._width
+            else:
+                self._zones[i], self._texts[i], self._chars[i] = cells
+
+    def _setPosition(self, r: int, c: int):
+        # US positioning, also resets the attributes
+        if r == 0 and self._r != 0:
+            self._saved = (self._r, self._c)
+        self._moveTo(max(0, min(r, self._height - 1)), max(1, min(c, self._width)))
+        self._resetAttributes()
+
+    def _moveTo(self, r: int, c: int):
+        if r != self._r:
+            self._resetZone()
+        self._r, self._c = r, c
+
+    def _moveRight(self):
+        if self._c < self._width:
+            self._c += 1
+        elif self._r == 0:
+            # The status row doesn't wrap
+            pass
+        else:
+            self._c = 1
+            self._moveDown()
+
+    def _moveLeft(self):
+        if self._c > 1:
+            self._c -= 1
+        elif self._r > 0:
+            self._c = self._width
+            self._moveUp()
+
+    def _moveDown(self):
+        if self._r == 0:
+            self._moveTo(*self._saved)
+        elif self._r < self._height - 1:
+            self._moveTo(self._r + 1, self._c)
+        elif self._roll:
+            self._scroll(1, 1)
+            self._resetZone()
+        else:
+            self._moveTo(1, self._c)
+
+    def _moveUp(self):
+        if self._r > 1:
+            self._moveTo(self._r - 1, self._c)
+        elif self._r == 1:
+            if self._roll:
+                self._scroll(1, -1)
+                self._resetZone()
+            else:
+                self._moveTo(self._height - 1, self._c)
+
+
+class MinitelEmulator(TerminalState):
+    '''
+    Headless Minitel 1B answering the protocol queries sent by pyminitel's Minitel, standing in for the terminal.
+    Whatever the emulator transmits (answers, keys) is handed to the transmit callback, see CommLoopback and EmulatorSocketClient.
+    '''
+
+    SCREEN = 0
+    KEYBOARD = 1
+    MODEM = 2
+    CONNECTOR = 3
+
+    # Module's codes as receiver and as transmitter
+    _MODULES_IN = {0x58: SCREEN, 0x59: KEYBOARD, 0x5a: MODEM, 0x5b: CONNECTOR}
+    _MODULES_OUT = {0x50: SCREEN, 0x51: KEYBOARD, 0x52: MODEM, 0x53: CONNECTOR}
+
+    def __init__(self, rom: bytes = b'Cu<', mode: Mode = Mode.VIDEOTEX, transmit = None) -> None:
+        '''
+        Emulator's constructor.
+
+            Parameters:
+                rom (bytes): Manufacturer, model and firmware version answered to ENQROM - Default is a VGP5 Minitel 1B
+                mode (Mode): Initial video mode
+                transmit (Callable[[bytes], None]): Called with the bytes sent by the Minitel - Default None, they are dropped
+        '''
+        self._rom = rom
+        self._transmit = transmit
+
+        self._keyboard_extended = False
+        self._keyboard_c0 = False
+        self._lowercase = False
+        self._pce = False
+        self._speed = 0x40 | 4 << 3 | 4
+
+        # Transmitters each receiver listens to, as the bitfield answered by PRO3
+        self._routes = {
+            self.SCREEN: 1 << self.MODEM | 1 << self.CONNECTOR,
+            self.KEYBOARD: 0,
+            self.MODEM: 1 << self.KEYBOARD | 1 << self.CONNECTOR,
+            self.CONNECTOR: 1 << self.KEYBOARD | 1 << self.MODEM,
+        }
+
+        super().__init__(mode=mode)
+
+    def setTransmit(self, transmit):
+        self._transmit = transmit
+
+    def receive(self, data: bytes):
+        '''
+        Interpret the bytes received and transmit the answers.
+        '''
+        answer = self.feed(data)
+        if len(answer):
+            self.transmit(answer)
+
+    def transmit(self, data: bytes):
+        if self._transmit is not None:
+            self._transmit(data)
+
+    def press(self, key):
+        '''
+        Simulate a key press, the key being a KeyboardCode's value or raw bytes.
+        '''
+        self.transmit(bytes(key))
+
+    def _operatingStatus(self) -> int:
+        return 0x40 | self._lowercase << 3 | self._pce << 2 | self._roll << 1 | (self._mode == Mode.MIXED)
+
+    def _keyboardStatus(self) -> int:
+        return 0x40 | self._keyboard_c0 << 2 | self._keyboard_extended
+
+    def _protocol(self, sequence: bytes) -> bytes:
+        pro = sequence[1]
+        code = sequence[2]
+        arguments = sequence[3:]
+
+        if pro == PRO1:
+            if code == 0x7b:
+                return b'\x01' + self._rom + b'\x04'
+            if code == 0x72:
+                return bytes([ESC, PRO2, 0x73, self._operatingStatus()])
+            if code == 0x76:
+                return bytes([ESC, PRO2, 0x77, 0x40])
+
+        elif pro == PRO2:
+            if code == 0x32 and arguments[0] in (0x7d, 0x7e):
+                mode = Mode.MIXED if arguments[0] == 0x7d else Mode.VIDEOTEX
+                if mode != self._mode:
+                    self.setMode(mode)
+                return bytes([SEP, 0x70 if mode == Mode.MIXED else 0x71])
+            if code == 0x72 and arguments[0] == 0x59:
+                return bytes([ESC, PRO3, 0x73, 0x59, self._keyboardStatus()])
+            if code == 0x62 and arguments[0] in self._MODULES_IN:
+                return bytes([ESC, PRO3, 0x63, arguments[0], 0x40 | self._routes[self._MODULES_IN[arguments[0]]]])
+            if code == 0x69 or code == 0x6a:
+                start = code == 0x69
+                if arguments[0] == 0x43:
+                    self._roll = start
+                elif arguments[0] == 0x44:
+                    self._pce = start
+                elif arguments[0] == 0x45:
+                    self._lowercase = start
+                return bytes([ESC, PRO2, 0x73, self._operatingStatus()])
+            if code == 0x6b:
+                self._speed = arguments[0]
+                return bytes([ESC, PRO2, 0x75, self._speed])
+            if code == 0x66:
+                return bytes([SEP, 0x57])
+            if code == 0x64 or code == 0x65:
+                return b''
+
+        elif pro == PRO3:
+            if (code == 0x60 or code == 0x61) and arguments[0] in self._MODULES_IN and arguments[1] in self._MODULES_OUT:
+                receiver = self._MODULES_IN[arguments[0]]
+                transmitter = self._MODULES_OUT[arguments[1]]
+                if code == 0x61:
+                    self._routes[receiver] |= 1 << transmitter
+                else:
+                    self._routes[receiver] &= ~(1 << transmitter)
+                return bytes([ESC, PRO3, 0x63, arguments[0], 0x40 | self._routes[receiver]])
+            if (code == 0x69 or code == 0x6a) and arguments[0] == 0x59:
+                if arguments[1] == 0x41:
+                    self._keyboard_extended = code == 0x69
+                elif arguments[1] == 0x43:
+                    self._keyboard_c0 = code == 0x69
+                return bytes([ESC, PRO3, 0x73, 0x59, self._keyboardStatus()])
+
+        log(DEBUG, 'Unhandled protocol sequence ' + sequence.hex())
+        return b''
+
+
+class CommLoopback(Comm):
+    '''
+    In process Comm connected to a MinitelEmulator, to be given to Minitel's constructor.
+    '''
+
+    def __init__(self, emulator: MinitelEmulator = None, timeout: float = None):
+        self._emulator = emulator if emulator is not None else MinitelEmulator()
+        self._received = bytearray()
+        self._condition = Condition()
+        self._closed = False
+
+        self._emulator.setTransmit(self._receive)
+        self.setTimeout(timeout=timeout)
+        super().__init__()
+
+    def getEmulator(self) -> MinitelEmulator:
+        return self._emulator
+
+    def _receive(self, data: bytes):
+        with self._condition:
+            self._received += data
+            self._condition.notify_all()
+
+    def read(self, n = int) -> bytes:
+        # Like a serial port, returns what has been received when the timeout is reached
+        timeout = self.getTimeout()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while len(self._received) < n and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            data = bytes(self._received[:n])
+            del self._received[:n]
+        return data
+
+    def readBuffered(self) -> bytes:
+        with self._condition:
+            data = bytes(self._received)
+            self._received.clear()
+        return data
+
+    def open(self):
+        pass
+
+    def close(self):
+        # Like a closed port, reads return at once
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def run(self):
+        run = True
+        while run:
+            try:
+                queued_data, count = self._gather()
+                self._emulator.receive(queued_data)
+                self._done(count, len(queued_data))
+            except Empty:
+                if self.stopped():
+                    run = False
+
+
+class EmulatorSocketClient(Thread):
+    '''
+    Connects a MinitelEmulator to a pyminitel TCP server (Minitel instantiated with "ip"), like a Minitel behind a socket bridge.
+    '''
+
+    def __init__(self, host: str, port: int, emulator: MinitelEmulator = None):
+        self._emulator = emulator if emulator is not None else MinitelEmulator()
+        self._tcp = socket(AF_INET, SOCK_STREAM)
+        self._tcp.connect((host, port))
+        self._running = True
+
+        self._emulator.setTransmit(self._tcp.sendall)
+        super().__init__(daemon=True)
+
+    def getEmulator(self) -> MinitelEmulator:
+        return self._emulator
+
+    def stop(self):
+        self._running = False
+        self._tcp.close()
+
+    def run(self):
+        while self._running:
+            try:
+                data = self._tcp.recv(4096)
+            except OSError as e:
+                if self._running:
+                    log(ERROR, str(e))
+                break
+            if not len(data):
+                break
+            self._emulator.receive(data)
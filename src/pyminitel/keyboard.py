@@ -511,3 +511,83 @@ class VideotexKeyboardCode(KeyboardCode):
                 return 'œ'
             case self.Ctrl_Next:
                 return 'β'
+
+
+class KeyboardDecoder:
+    '''
+    Byte trie of the keyboard codes, built once, splitting the Minitel's keyboard input into keys.
+    Each node maps the next byte to its child, a complete code also holds its key and character under None.
+    '''
+
+    def __init__(self, codes: tuple = (FunctionKeyboardCode, CursorKeyboardCode, VideotexKeyboardCode)):
+        self._root = {}
+        self._chars = {}
+
+        for code in codes:
+            for key in code:
+                node = self._root
+                for b in key:
+                    node = node.setdefault(b, {})
+                # First code of a value wins, like aenum's lookup
+                if None not in node:
+                    node[None] = bytes(key)
+
+                if code is VideotexKeyboardCode and bytes(key) not in self._chars:
+                    self._chars[bytes(key)] = key.char()
+
+    def isPrefix(self, data: bytes) -> bool:
+        '''
+        Returns True if data starts a longer code, the next byte is then part of the key.
+        '''
+        node = self._root
+        for b in data:
+            node = node.get(b)
+            if node is None:
+                return False
+        return len(node) > (None in node)
+
+    def char(self, key: bytes) -> str:
+        '''
+        Returns the key's character, '' for the keys not typing one (function and cursor keys, unknown codes).
+        '''
+        return self._chars.get(key, '')
+
+    def decode(self, data: bytes, final: bool = False) -> tuple:
+        '''
+        Split the input into keys in one pass, each one the longest complete code starting it.
+
+            Parameters:
+                data (bytes): Keyboard input
+                final (bool): When True an incomplete code ending data is returned as a key, else it is left to be decoded
+                              with the next input, e.g. a SS2, SEP or ESC not followed by the rest of its code yet
+
+            Returns:
+                keys (list): Keys' codes, in order - Unknown codes are returned as they came, up to the byte ending them
+                remainder (bytes): Bytes of the incomplete code ending data
+        '''
+        keys = []
+        i = 0
+        while i < len(data):
+            node = self._root
+            j = i
+            # End of the longest complete code starting at i
+            end = None
+            while j < len(data) and data[j] in node:
+                node = node[data[j]]
+                j += 1
+                if None in node:
+                    end = j
+
+            if j == len(data) and len(node) > (None in node) and not final:
+                break
+
+            if end is None:
+                # As read byte by byte, an unknown code ends with the byte no code follows with
+                end = min(j + 1, len(data))
+            keys.append(data[i:end])
+            i = end
+
+        return keys, data[i:]
+
+
+KEYBOARD_DECODER = KeyboardDecoder()
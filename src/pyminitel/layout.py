@@ -13,8 +13,12 @@ CR = b'\x0d'        # Carriage Return
 CSI = b'\x1b\x5b'    # Control Sequence Introducer
 RS = b'\x1e'        # Record Separator
 FF = b'\x0c'        # Form Feed
-US = b'\x1e'        # Unit Separator
+US = b'\x1f'        # Unit Separator
 CAN = b'\x18'       # Cancel
+REP = b'\x12'       # Repetition
+
+# Longest repetition a single REP can carry
+REP_MAX = 63
 
 CUU = b'\x41'       # Cursor Up
 CUD = b'\x42'       # Cursor Down
@@ -136,9 +140,47 @@ class Layout:
         # TODO - Test
         return CSI + str.encode(str(n)) + b'\x4c'
 
+    def repeat(n: int = 1) -> bytes:
+        if n < 1 or n > REP_MAX:
+            log(ERROR, 'Invalid argument passed, repetition count must be between 1 and ' + str(REP_MAX) + '.')
+            return b''
+        return REP + bytes([0x40 + n])
+
+    def repeatCharacter(encoded: bytes, n: int, vm: VisualizationModule) -> bytes:
+        '''
+        Encode n times an already encoded character, using REP when shorter.
+
+            Parameters:
+                encoded (bytes): The character as returned by ascii_to_alphanumerical
+                n (int): Number of times the character is displayed
+                vm (VisualizationModule): Targeted Visualization Module - VGP2 only repeats G0 characters while VGP5 also repeats SS2 ones
+
+            Returns:
+                sequence (bytes): The characters' sequence
+        '''
+        # REP repeats the last displayed character, substitutions spelled with several characters can't be repeated
+        repeatable = len(encoded) == 1 and encoded >= b'\x20'
+        if vm != VisualizationModule.VGP2 and encoded[0:1] == SS2 and len(encoded) <= 3:
+            repeatable = True
+
+        if not repeatable or n * len(encoded) <= len(encoded) + len(REP) + 1:
+            return encoded * n
+
+        command = encoded
+        n -= 1
+        while n > 0:
+            count = min(n, REP_MAX)
+            if count * len(encoded) <= len(REP) + 1:
+                command += encoded * count
+            else:
+                command += Layout.repeat(count)
+            n -= count
+
+        return command
+
     def addSubSection(r: int, c: int, char: str = None) -> bytes:
         # TODO - Test
-        if str is not None:
+        if char is not None:
             if len(char) != 1:
                 log(ERROR, "Invalid argument passer, expected character but got" + char + ".")
         
@@ -153,6 +195,99 @@ class Layout:
         us = US + binary_r + binary_c
 
         if char is not None:
-            us += ascii_to_alphanumerical('A', VisualizationModule.VGP5)
+            us += ascii_to_alphanumerical(char, VisualizationModule.VGP5)
 
         return us
+
+
+class CursorPlanner:
+    '''
+    Tracks the Minitel's cursor while encoding and picks the shortest sequence moving it to a given position.
+    Positions are 1 based, None when unknown.
+    '''
+
+    def __init__(self, r: int = None, c: int = None, height: int = 24, width: int = 40) -> None:
+        self._height = height
+        self._width = width
+
+        self._r = r
+        self._c = c
+        # False when the position is only assumed, relative moves are then forbidden
+        self._exact = r is not None
+
+    def position(self) -> tuple:
+        return self._r, self._c
+
+    def advance(self, n: int = 1, exact: bool = True):
+        '''
+        Update the position after n characters have been written.
+        Writing past the last column goes to the next row, past the last row the position is lost.
+        '''
+        if self._r is None:
+            return
+
+        self._c += n
+        while self._c > self._width:
+            self._c -= self._width
+            self._r += 1
+
+        if self._r > self._height:
+            self._r, self._c = None, None
+            self._exact = False
+        elif not exact:
+            self._exact = False
+
+    def moveTo(self, r: int, c: int, rewrite: bytes = None, reset_cost: int = None) -> tuple:
+        '''
+        Plan the cursor move to (r, c) and update the tracked position.
+
+            Parameters:
+                r (int): Targeted row
+                c (int): Targeted column
+                rewrite (bytes): Characters between the cursor and the target on the same row, rewriting them is a candidate move
+                reset_cost (int): Extra bytes needed once attributes are reset by US or RS - When None these moves are not considered
+
+            Returns:
+                sequence (bytes): The shortest move, empty if the cursor is already there
+                reset (bool): True if the move resets the attributes
+        '''
+        if (self._r, self._c) == (r, c):
+            return b'', False
+
+        candidates = []
+
+        if self._exact:
+            candidates.append((CursorPlanner._relative(self._r, self._c, r, c), False))
+            if self._c != 1:
+                candidates.append((Layout.cariageReturn() + CursorPlanner._relative(self._r, 1, r, c), False))
+
+        candidates.append((Layout.setCursorPosition(r, c), False))
+
+        if self._exact and rewrite is not None and r == self._r and c > self._c:
+            candidates.append((rewrite, False))
+
+        if reset_cost is not None:
+            candidates.append((Layout.addSubSection(r, c), True))
+            candidates.append((Layout.resetCursor() + CursorPlanner._relative(1, 1, r, c), True))
+
+        sequence, reset = min(candidates, key=lambda candidate: len(candidate[0]) + (reset_cost if candidate[1] else 0))
+
+        self._r, self._c = r, c
+        self._exact = True
+
+        return sequence, reset
+
+    def _relative(r0: int, c0: int, r: int, c: int) -> bytes:
+        command = b''
+
+        if r > r0:
+            command += Layout.moveCursorDown(r - r0)
+        elif r < r0:
+            command += Layout.moveCursorUp(r0 - r)
+
+        if c > c0:
+            command += Layout.moveCursorRight(c - c0)
+        elif c < c0:
+            command += Layout.moveCursorLeft(c0 - c)
+
+        return command
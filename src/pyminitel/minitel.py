@@ -1,16 +1,25 @@
-import time, socket
+import time, socket, inspect, asyncio
+
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Lock
+from contextlib import contextmanager
+from functools import partial
 
 from enum import Enum
 from logging import log, ERROR, WARNING, INFO
 
 import pyminitel.alphanumerical as alphanumerical
 from pyminitel.attributes import *
-from pyminitel.layout import Layout
+from pyminitel.layout import Layout, CursorPlanner
 from pyminitel.mode import Mode, RESOLUTION
 from pyminitel.visualization_module import VisualizationModule
 from pyminitel.mode import Mode
 from pyminitel.keyboard import *
-from pyminitel.comm import CommSerial, CommSocket, CommException
+from pyminitel.comm import Comm, CommSerial, CommSocket, AsyncCommSocket, CommException
+from pyminitel.demux import InputDemux
+from pyminitel.emulator import TerminalState
+from pyminitel.videotex_codec import encodeText
 
 class MinitelException(Exception):
     # Raised on object's instanciation
@@ -133,8 +142,15 @@ class Minitel:
 
         MINITEL_5 = 'y'
 
+    # Profiles of the Minitels handshaked with, the data derived from their ROM by ROM (manufacturer, model, firmware
+    # version), and the ROM and baudrate last found on each serial port
+    _profiles = {}
+    _ports = {}
+
+    # Bytes sent kept for the shadow before it is fed
+    SHADOW_PENDING_MAX = 16384
 
-    def __init__(self, port: str, baudrate = ConnectorBaudrate.BAUDS_1200, ip: str = None, mode: Mode = Mode.VIDEOTEX, timeout: float = None, tcp: socket = None):
+    def __init__(self, port: str, baudrate = ConnectorBaudrate.BAUDS_1200, ip: str = None, mode: Mode = Mode.VIDEOTEX, timeout: float = None, tcp: socket = None, comm: Comm = None):
         '''
         Minitel's constructor - This function is raising MinitelException if unable to retreive basic minitel's information.
         This object will instantiate a serial communication or a TCP socket (as server) depending if "ip" argument given is None or not.
@@ -143,18 +159,88 @@ class Minitel:
             Parameters:
                 port (str): Either Serial's port or IP's port (ex: '/dev/ttyUSB0' or '8080') - The value has no effect on deciding the type of communication
                 bauderate (Minitel.ConnectorBaudrate): The bauderate of DIN's connector - Default 1200
+                                                       TCP Socket writes are paced at it, the bridges forwarding them have no flow control - None doesn't pace them
                 ip (str): IP for TCP Socket server - When not None the constructor will attempt to use Socket - Default None
                 mode (Mode): Minitel's Mode - Default is Videotex (standard mode)
                 timeout (float): Set the comm timeout (default None)
+                comm (Comm): Not started Comm to use instead of opening one, e.g. emulator.CommLoopback - Default None
 
             Returns:
                 Minitel instantiated object if basics minitel info retreived else raises MinitelException
 
         '''
 
+        self._initAttributes()
+
+        if comm is not None:
+            self._comm = comm
+            self._comm.setTimeout(timeout)
+        elif not ip and not tcp:
+            self._profile_key = port
+            try:
+                self._comm = CommSerial(port=port, baudrate=baudrate.to_int(), timeout=timeout)
+            except CommException as e:
+                log(ERROR, 'Unable to open Serial - ' + str(e))
+                raise MinitelException
+        else:
+            try:
+                int_port = None
+                if port:
+                    int_port = int(port)
+                self._comm = CommSocket(port=int_port, host=ip, timeout=timeout, tcp=tcp, baudrate=baudrate.to_int() if baudrate else None)
+            except CommException as e:
+                log(ERROR, 'Unable to create socket - ' + str(e))
+                raise MinitelException
+        
+        log(level=DEBUG, msg='New Comm: id ' + str(id(self._comm)))
+
+        try:
+            self._comm.start()
+        except RuntimeError:
+            log(ERROR, 'Thread of Comm already started')
+        
+        if timeout is None:
+            self._comm.setTimeout(10)
+
+        self._port = port
+        self._baudrate = baudrate
+
+        self._text_attribute = TextAttributes().intern()
+        self._zone_attribute = ZoneAttributes().intern()
+
+        self._bindings = {}
+
+        if not self._exchange(self._handshake(mode)):
+            log(ERROR, 'Unable to communicate with the minitel, bad baudrate or com port.')
+            raise MinitelException
+
+        if timeout is None:
+            self._comm.setTimeout(None)
+    
+    def _initAttributes(self):
+        self._batch = None
         self._port = None
         self._baudrate = None
         self._comm = None
+        self._demux = None
+        self._profile_key = None
+
+        # Shadow of the Minitel's screen, fed with what is sent before being looked at
+        self._shadow = TerminalState()
+        self._shadow.forgetAttributes()
+        self._unshadowed = bytearray()
+        # Shadowed states known to match the Minitel's: 'screen' (cursor, attributes and character set) once cleared,
+        # 'cursor' (visibility) and 'masking' once set
+        self._shadow_known = set()
+        # Bytes posted from other threads, written at the next boundary between the Minitel's messages (see post)
+        self._posted = []
+        self._posted_lock = Lock()
+        self._idle = False
+        self._keyboard_enabled = None
+        self._echo_enabled = None
+        # Keys decoded from the input received with the last one read, and the incomplete code ending it
+        self._typed_keys = deque()
+        self._typed_rest = b''
 
         self._manufacturer = None
         self._model = None
@@ -180,53 +266,315 @@ class Minitel:
         }
         self._bindings = None
 
-        if not ip and not tcp:
-            try:
-                self._comm = CommSerial(port=port, baudrate=baudrate.to_int(), timeout=timeout)
-            except CommException as e:
-                log(ERROR, 'Unable to open Serial - ' + str(e))
-                raise MinitelException
-        else:
-            try:
-                int_port = None
-                if port:
-                    int_port = int(port)
-                self._comm = CommSocket(port=int_port, host=ip, timeout=timeout, tcp=tcp)
-            except CommException as e:
-                log(ERROR, 'Unable to create socket - ' + str(e))
-                raise MinitelException
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        '''
+        Write the pending messages, stop the Comm's thread and the input demultiplexer then close the connection.
+        '''
+        if self._demux:
+            self._demux.stop()
+
+        if self._comm:
+            if not self._comm.stopped():
+                self._comm.stop()
+                if self._comm.is_alive():
+                    self._comm.join()
         
-        log(level=DEBUG, msg='New Comm: id ' + str(id(self._comm)))
+            self._comm.close()
+
+        # Closing the connection ended its read
+        self.stopInputDemux()
+
+    def read(self, n: bytes, prefix: bytes = b'') -> bytes:
+        self._flushBatch()
+        if self._demux:
+            # The answer comes whole, keys typed meanwhile are kept for readKeyboard
+            return self._demux.readAnswer(self._comm.getTimeout(), prefix)
 
         try:
-            self._comm.start()
-        except RuntimeError:
-            log(ERROR, 'Thread of Comm already started')
-        
-        if timeout is None:
-            self._comm.setTimeout(10)
+            return self._comm.read(n)
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+            return None
 
-        self._port = port
-        self._baudrate = baudrate
+    
+    def send(self, data: bytes, shadowed: bool = True) -> int:
+        '''
+        Queue bytes to the Minitel, or add them to the current batch.
 
-        self._text_attribute = TextAttributes()
-        self._zone_attribute = ZoneAttributes()
+            Parameters:
+                data (bytes): Bytes to send
+                shadowed (bool): When False the shadow doesn't interpret them and forgets the screen's state instead, for
+                                 pages written by the encoder or VDT files - Default True
 
-        self._bindings = {}
+            Returns:
+                0 on success, -1 otherwise
+        '''
+        if shadowed:
+            self._unshadowed += data
+            if len(self._unshadowed) > self.SHADOW_PENDING_MAX:
+                self._getShadow()
+        else:
+            self._forgetScreen()
 
-        res = self.getMinitelInfo()
-        if res is None:
-            log(ERROR, 'Unable to communicate with the minitel, bad baudrate or com port.')
-            raise MinitelException
+        return self._put(data)
 
+    def _put(self, data: bytes) -> int:
+        if self._batch is not None:
+            self._batch += data
+            return 0
+
+        try:
+            self._comm.put(data)
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+            return -1
         
+        return 0
+
+    def post(self, data: bytes) -> int:
+        '''
+        Queue bytes sent from another thread than the Minitel's, e.g. by a BroadcastHub: they are written while the
+        Minitel's thread waits for a key, or else once its current batch is sent, never between its own sends.
+        The screen's shadow and the attributes in effect are no longer trusted, the bytes are expected to position
+        themselves and leave G0 selected.
+
+            Parameters:
+                data (bytes): Bytes to send
+
+            Returns:
+                0 on success, -1 otherwise
+        '''
+        if self._comm.stopped():
+            return -1
+
+        with self._posted_lock:
+            self._posted.append(data)
+            if self._idle:
+                return self._writePosted()
+
+        return 0
+
+    def getPendingSize(self) -> int:
+        '''
+        Returns the number of bytes queued and not written yet, posted ones included.
+        '''
+        with self._posted_lock:
+            posted = sum(len(data) for data in self._posted)
+        return self._comm.getPendingSize() + posted
+
+    def _setIdle(self, idle: bool):
+        # While the Minitel's thread waits for a key, the bytes posted are written right away
+        with self._posted_lock:
+            self._idle = idle
+            self._writePosted()
+
+    def _writePosted(self) -> int:
+        # Called holding _posted_lock, by the Minitel's thread or while it is idle
+        if not self._posted:
+            return 0
+
+        posted, self._posted = self._posted, []
+        self._forgetScreen()
+        try:
+            for data in posted:
+                self._comm.put(data)
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+            return -1
+
+        return 0
+
+    def _forgetAttributes(self):
+        # The attributes in effect are unknown until reset, e.g. after bytes the shadow didn't see
+        self._getShadow().forgetAttributes()
+        self._text_attribute = None
+        self._zone_attribute = None
+
+    def _forgetScreen(self):
+        # After a page the shadow didn't interpret, its cursor and attributes are unknown until the screen is cleared, and
+        # the cursor's visibility and the masking until set again
+        self._forgetAttributes()
+        self._shadow_known.difference_update(('screen', 'cursor', 'masking'))
+
+    def _getShadow(self) -> TerminalState:
+        if len(self._unshadowed):
+            self._shadow.feed(bytes(self._unshadowed))
+            self._unshadowed.clear()
+        return self._shadow
+
+    def sendStream(self, chunks) -> int:
+        '''
+        Queue the chunks one by one as they are produced, e.g. by Videotex.iterVideotex, so the Comm can write the first ones while the next are encoded.
+
+            Parameters:
+                chunks (Iterable[bytes]): Bytes to send, in order
+
+            Returns:
+                0 on success, -1 otherwise
+        '''
+        # The encoder's pages aren't interpreted by the shadow, which forgets the screen's state once
+        self._forgetScreen()
+        for chunk in chunks:
+            if self._put(chunk):
+                return -1
+
+        return 0
+
+    @contextmanager
+    def batch(self, optimizer = None):
+        '''
+        Context manager collecting everything sent within its block into a single message, queued when the block exits.
+        Commands waiting for the Minitel's answer send what has been collected so far before reading it.
+        Nested batches join the outermost one.
+
+            Parameters:
+                optimizer (Callable[[bytes], bytes]): Applied to the collected bytes before they are sent - Default is None
+
+            Returns:
+                minitel (Minitel): This Minitel
+        '''
+        if self._batch is not None:
+            yield self
+            return
+
+        self._batch = bytearray()
+        self._batch_optimizer = optimizer
+        try:
+            yield self
+        finally:
+            self._flushBatch()
+            self._batch = None
+            with self._posted_lock:
+                self._writePosted()
+
+    def _flushBatch(self):
+        if not self._batch:
+            return
+
+        data = bytes(self._batch)
+        self._batch.clear()
+        if self._batch_optimizer is not None:
+            data = self._batch_optimizer(data)
+
+        # Bypassing send, the batch is still open
+        try:
+            self._comm.put(data)
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+
+    def startInputDemux(self) -> InputDemux:
+        '''
+        Read the Minitel's input from a background thread splitting keys from protocol answers, so keys typed during a
+        query are not lost and queries can be pipelined (see pipeline).
+
+            Returns:
+                demux (InputDemux): The running demultiplexer
+        '''
+        if self._demux is None or self._demux.stopped():
+            self._demux = InputDemux(self._comm)
+            self._demux.start()
+
+        return self._demux
+
+    def stopInputDemux(self):
+        if self._demux:
+            self._demux.stop()
+            self._demux.join()
+            self._demux = None
+
+    def pipeline(self, *queries) -> list:
+        '''
+        Send every query before waiting for their answers, the input demultiplexer matching each with the answer it expects.
+        Without it (see startInputDemux), queries are run one after another.
+
+            Parameters:
+                queries: Query methods, e.g. minitel.getCursorPosition, or partials giving their arguments, e.g.
+                         functools.partial(minitel.setVideoMode, Mode.MIXED)
+
+            Returns:
+                results (list): Each query's result, in order
+        '''
+        protocols = self._protocols(queries)
+
+        if not self._demux:
+            return [self._exchange(protocol) for protocol in protocols]
+
+        self._demux.discardAnswers()
+
+        results = [None] * len(protocols)
+        waiting = deque()
+
+        def step(i, protocol, answer = None):
+            try:
+                _, prefix = protocol.send(answer)
+            except StopIteration as result:
+                results[i] = result.value
+                return
+            waiting.append((i, protocol, self._demux.expect(prefix)))
+
+        for i, protocol in enumerate(protocols):
+            step(i, protocol)
+        self._flushBatch()
+
+        timeout = self._comm.getTimeout()
+        while waiting:
+            i, protocol, future = waiting.popleft()
+            try:
+                answer = future.result(timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                answer = b''
+            step(i, protocol, answer)
+            self._flushBatch()
+
+        return results
+
+    def _protocols(self, queries) -> list:
+        # Each query method's protocol generator
+        protocols = []
+        for query in queries:
+            args, kwargs = (), {}
+            if isinstance(query, partial):
+                query, args, kwargs = query.func, query.args, query.keywords
+            protocols.append(getattr(self, '_' + query.__name__)(*args, **kwargs))
+        return protocols
+
+    def _exchange(self, protocol):
+        # Drive a protocol generator: it sends its requests and yields the length of each answer it waits for and the
+        # bytes it starts with, which route it to the protocol once the input is demultiplexed
+        if self._demux:
+            self._demux.discardAnswers()
+        try:
+            expected = next(protocol)
+            while True:
+                expected = protocol.send(self.read(*expected))
+        except StopIteration as result:
+            return result.value
+
+    def _handshake(self, mode: Mode):
+        # Retrieve the Minitel's information and set its video mode, False if it doesn't answer
+        # The status and keyboard mode are live, they are always queried in the ROM query's round trip
+        # Giving up as soon as the ROM isn't answered, instead of waiting for every answer's timeout
+        info, status, keyboard = yield from self._concurrently(self._getMinitelInfo(), self._getModuleOperatingModeStatus(), self._getKeyboardMode(), required=True)
+
+        if info is None:
+            return False
+
+        # The ROM identifies the Minitel, a known one's profile gives its visualization module
+        profile = Minitel._profiles.get(info)
+        if profile is not None:
+            self._vm = profile['vm']
+
         print('[Minitel Info]')
         print('- ROM ID: "' + self._manufacturer.value + self._model.value + self._fw_version + '"')
         print('* Manufacturer: ' + self._manufacturer.name)
         print('* Model: ' + self._model.name)
         print('* Firmware Version: ' + self._fw_version)
 
-        if self.getVisualizationModule() is None:
+        if profile is None and self.getVisualizationModule() is None:
             log(ERROR, 'Unable to retrive with the minitel visualization module')
         else:
             print('* Visualization Module: ' + self._vm.name)
@@ -234,7 +582,7 @@ class Minitel:
         if self._model != self.Model.MINITEL_1B:
             log(WARNING, 'pyMinitel is supporting MINITEL 1B for now, try at your own risk.')
         
-        if self.getModuleOperatingModeStatus() is None:
+        if status is None:
             log(ERROR, 'Unable to retrive with the minitel module operating mode status')
         else:
             print('[Modules Operating Mode Status]')
@@ -243,46 +591,80 @@ class Minitel:
             print('* Roll Mode: ' + str(self._roll_mode_enabled))
             print('* Screen Mode: ' + str(self._mode.name))
 
-        if self.setVideoMode(mode):
+        if (yield from self._setVideoMode(mode)):
             log(ERROR, 'Unable to set video mode')
         else:
             print('* New Video Mode:' + str(self._mode.name))
 
-        if self.getKeyboardMode() is None:
+        if keyboard is None:
             log(ERROR, 'Unable to retreive keyboard mode')
         else:
             print('* Keyboard Extended: ' + str(self._keyboard_extended))
             print('* Keyboard C0: ' + str(self._keyboard_c0))
 
-        if timeout is None:
-            self._comm.setTimeout(None)
-    
-    def __del__(self):
-        if self._comm:
-            if not self._comm.stopped():
-                self._comm.stop()
-                self._comm.join()
-        
-            self._comm.close()
+        self._shadow.setMode(self._mode)
+        self._shadow.setRollMode(bool(self._roll_mode_enabled))
+        self._shadow.forgetAttributes()
 
-    def read(self, n: bytes) -> bytes:
-        try:
-            return self._comm.read(n)
-        except CommException as e:
-            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+        Minitel._profiles[info] = {
+            'rom': info,
+            'vm': self._vm,
+        }
+        if self._profile_key is not None:
+            Minitel._ports[self._profile_key] = info, self._baudrate
+
+        return True
+
+    def _concurrently(self, *protocols, required: bool = False):
+        # Run the protocols sending all their requests at once, then reading the answers in the order they were sent
+        # When required, the others are dropped as soon as the first one returns None
+        results = [None] * len(protocols)
+        waiting = deque()
+
+        with self.batch():
+            for i, protocol in enumerate(protocols):
+                try:
+                    waiting.append((i, protocol, next(protocol)))
+                except StopIteration as result:
+                    results[i] = result.value
+
+        while waiting:
+            i, protocol, expected = waiting.popleft()
+            answer = yield expected
+            try:
+                waiting.append((i, protocol, protocol.send(answer)))
+            except StopIteration as result:
+                results[i] = result.value
+                if required and i == 0 and result.value is None:
+                    for _, dropped, _ in waiting:
+                        dropped.close()
+                    break
+
+        return results
+
+    def getProfile(port: str) -> dict:
+        '''
+        Profile of the Minitel found by the last connection to a serial port - Used as Minitel.getProfile(port).
+
+            Parameters:
+                port (str): Serial's port
+
+            Returns:
+                profile (dict): 'rom' (Manufacturer, Model, firmware version), 'vm' and 'baudrate' (ConnectorBaudrate), None if unknown
+        '''
+        if port not in Minitel._ports:
             return None
 
-    
-    def send(self, data: bytes) -> int:
-        try:
-            self._comm.put(data)
-        except CommException as e:
-            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
-            return -1
-        
-        return 0
+        rom, baudrate = Minitel._ports[port]
+        profile = Minitel._profiles.get(rom)
+        if profile is None:
+            return None
+        return dict(profile, baudrate=baudrate)
 
     def switchReceiverTransmitter(self, receiver: Module, transmitter: Module, on: bool = True) -> dict:
+        return self._exchange(self._switchReceiverTransmitter(receiver=receiver, transmitter=transmitter, on=on))
+
+    def _switchReceiverTransmitter(self, receiver: Module, transmitter: Module, on: bool = True):
         if (
             (receiver == self.Module.KEYBOARD and transmitter == self.Module.CONNECTOR) or
             (receiver == self.Module.KEYBOARD and transmitter == self.Module.MODEM) or
@@ -304,7 +686,7 @@ class Minitel:
         if self.send(command):
             log(ERROR, "Error while attempting to send switchReceiverTransmitter request")
             return None
-        answer = self.read(5)
+        answer = yield 5, self.PRO3 + self.FROM
         if answer is None or answer[0:2] != self.PRO3 or answer[2:3] != self.FROM or answer[3:4] != self.IO_CODES[receiver][self.IO.IN]:
             log(ERROR, "Response from switchReceiverTransmitter's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -325,7 +707,10 @@ class Minitel:
             Returns: 
                 is_module_unblocked (bool): Is module unblocked, else blocked
         '''
-        res = self.switchReceiverTransmitter(module, module, False)
+        return self._exchange(self._blockModule(module=module))
+
+    def _blockModule(self, module: Module):
+        res = yield from self._switchReceiverTransmitter(module, module, False)
         return res[module] == 1 if res is not None else None
 
     def unblockModule(self, module: Module) -> bool:
@@ -337,17 +722,23 @@ class Minitel:
             Returns: 
                 is_module_unblocked (bool): Is module unblocked, else blocked
         '''
-        res = self.switchReceiverTransmitter(module, module, True)
+        return self._exchange(self._unblockModule(module=module))
+
+    def _unblockModule(self, module: Module):
+        res = yield from self._switchReceiverTransmitter(module, module, True)
         return res[module] == 1 if res is not None else None
 
     def getModuleIOStatus(self, module: Module, io: IO) -> dict:
+        return self._exchange(self._getModuleIOStatus(module=module, io=io))
+
+    def _getModuleIOStatus(self, module: Module, io: IO):
         # TODO - TEST
         command = self.PRO2 + self.TO + self.IO_CODES[module][io]
 
         if self.send(command):
             log(ERROR, "Error while attempting to send getModuleIOStatus request")
             return None
-        answer = self.read(5)
+        answer = yield 5, self.PRO3 + self.FROM
         if answer is None or answer[0:2] != self.PRO3 or answer[2:3] != self.FROM or answer[3:4] != self.IO_CODES[module.value][io.value]:
             log(ERROR, "Response from getModuleIOStatus's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -376,6 +767,9 @@ class Minitel:
         self.send(command)
 
     def getProtocolStatus(self) -> dict:
+        return self._exchange(self._getProtocolStatus())
+
+    def _getProtocolStatus(self):
         # TODO - TEST
         command = self.PRO1 + self.STATUS_PROTOCOL_REQUEST
 
@@ -383,7 +777,7 @@ class Minitel:
             log(ERROR, "Error while attempting to send getProtocolStatus request")
             return None
 
-        answer = self.read(4)
+        answer = yield 4, self.PRO2 + self.STATUS_PROTOCOL_ANSWER
         if answer is None or answer[0:2] != self.PRO2 or answer[2:3] != self.STATUS_PROTOCOL_ANSWER:
             log(ERROR, "Response from getStatusProtocol's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -397,6 +791,9 @@ class Minitel:
         } 
 
     def setProtocolTransparency(self, n: int) -> int:
+        return self._exchange(self._setProtocolTransparency(n=n))
+
+    def _setProtocolTransparency(self, n: int):
         # TODO - TEST
         if n < 1 or n > 127:
             log(ERROR, "Invalid Argument, n should be between 1-127, got " + n + "")
@@ -411,7 +808,7 @@ class Minitel:
             log(ERROR, "Error while attempting to send setProtocolTransparency request")
             return -1
 
-        answer = self.read(2)
+        answer = yield 2, self.SEP + b'\x57'
         if answer is None or answer[0:1] != self.SEP or answer[1:2] != b'\x57':
             log(ERROR, "Response from setProtocolTransparency's Request is invalid (got :" + str(answer.hex()) + ")")
             return -1
@@ -419,13 +816,16 @@ class Minitel:
         return 0
 
     def getMinitelInfo(self) -> tuple:
+        return self._exchange(self._getMinitelInfo())
+
+    def _getMinitelInfo(self):
         command = self.PRO1 + self.ENQROM
 
         if self.send(command):
             log(ERROR, "Error while attempting to send getMinitelInfo request")
             return None
 
-        answer = self.read(5)
+        answer = yield 5, self.SOH
         if answer is None or answer[0:1] != self.SOH or answer[4:5] != self.EOT:
             log(ERROR, "Response from getMinitelInfo's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -451,13 +851,16 @@ class Minitel:
         return self._vm
     
     def getModuleOperatingModeStatus(self) -> tuple:
+        return self._exchange(self._getModuleOperatingModeStatus())
+
+    def _getModuleOperatingModeStatus(self):
         command = self.PRO1 + self.OPERATING_STATUS
 
         if self.send(command):
             log(ERROR, "Error while attempting to send getModuleOperatingModeStatus request")
             return None
 
-        answer = self.read(4)
+        answer = yield 4, self.PRO2 + self.OPERATING_STATUS_RES
         if answer is None or answer[0:2] != self.PRO2 or answer[2:3] != self.OPERATING_STATUS_RES:
             log(ERROR, "Response from getModuleOperatingModeStatus's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -480,6 +883,9 @@ class Minitel:
         return self._keyboard_caps_enabled, self._pce_enabled, self._roll_mode_enabled, self._mode
     
     def setVideoMode(self, mode: Mode = Mode.VIDEOTEX) -> int:
+        return self._exchange(self._setVideoMode(mode=mode))
+
+    def _setVideoMode(self, mode: Mode = Mode.VIDEOTEX):
         if mode is None:
             log(ERROR, 'Invalid None Argument')
             return -1
@@ -498,22 +904,29 @@ class Minitel:
             log(ERROR, "Error while attempting to send setVideoMode request")
             return -1
 
-        answer = self.read(2)
-        if  answer is None or mode == Mode.MIXED and answer[0:2] != self.SEP + b'\x70' or mode == Mode.VIDEOTEX and answer[0:2] != self.SEP + b'\x71':
+        expected = self.SEP + (b'\x70' if mode == Mode.MIXED else b'\x71')
+        answer = yield 2, expected
+        if answer is None or answer[0:2] != expected:
             log(ERROR, "Response from setVideoMode's Request is invalid (got :" + str(answer.hex()) + ")")
             return -1
 
         self._mode = mode
+        self._getShadow().setMode(mode)
+        self._getShadow().forgetAttributes()
+        self._shadow_known.discard('screen')
         return 0
 
     def getCursorPosition(self) -> tuple:
+        return self._exchange(self._getCursorPosition())
+
+    def _getCursorPosition(self):
         command = self.ESC + b'\x61'
 
         if self.send(command):
             log(ERROR, "Error while attempting to send getCursorPosition request")
             return None
 
-        answer = self.read(3)
+        answer = yield 3, self.US
         if answer is None or answer[0:1] != self.US:
             log(ERROR, "Response from getCursorPosition's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -522,15 +935,45 @@ class Minitel:
         return int.from_bytes(answer[1:2]) & mask, int.from_bytes(answer[2:3]) & mask
 
     def showCursor(self) -> int:
+        if 'cursor' in self._shadow_known and self._getShadow().isCursorVisible():
+            return 0
+
         if self.send(b'\x11'):
             log(ERROR, "Error while attempting to send showCursor request")
             return -1
+        self._shadow_known.add('cursor')
         return 0
 
     def hideCursor(self) -> int:
+        if 'cursor' in self._shadow_known and not self._getShadow().isCursorVisible():
+            return 0
+
         if self.send(b'\x14'):
             log(ERROR, "Error while attempting to send hideCursor request")
             return -1
+        self._shadow_known.add('cursor')
+        return 0
+
+    def setCursorPosition(self, r: int = 1, c: int = 1) -> int:
+        '''
+        Move the cursor, with the shortest sequence once the screen has been cleared - Nothing is sent if it is already there.
+
+            Parameters:
+                r (int): Row
+                c (int): Column
+        '''
+        if 'screen' in self._shadow_known:
+            height, width = RESOLUTION[self._mode]
+            cursor = CursorPlanner(*self._getShadow().cursor(), height=height - 1, width=width)
+            data, _ = cursor.moveTo(r, c)
+            if not len(data):
+                return 0
+        else:
+            data = Layout.setCursorPosition(r, c)
+
+        if self.send(data):
+            log(ERROR, "Error while attempting to send setCursorPosition request")
+            return -1
         return 0
 
     def connectModem(self) -> int:
@@ -604,7 +1047,7 @@ class Minitel:
                 return None
             time.sleep(.5)
 
-            answer = self.read(4)
+            answer = self.read(4, self.PRO2 + b'\x75')
             if answer is None or answer[0:2] != self.PRO2 or answer[2:3] != b'\x75':
                 log(ERROR, "Response from setConnectorBaudrate's Request is invalid (got :" + str(answer.hex()) + "), Unable to restore old baudrate...")
                 return None
@@ -617,7 +1060,7 @@ class Minitel:
             log(ERROR, "Error while attempting to send setConnectorBaudrate request")
             return None
         
-        answer = self.read(4)
+        answer = self.read(4, self.PRO2 + b'\x75')
         if answer is None or answer[0:2] != self.PRO2 or answer[2:3] != b'\x75':
             log(ERROR, "Response from setConnectorBaudrate's Request is invalid (got :" + str(answer.hex()) + "), Unable to restore old baudrate...")
             return None
@@ -631,14 +1074,18 @@ class Minitel:
 
             return old_baudrate, old_baudrate
 
-        return self.ConnectorBaudrate(new_emission_speed), self.ConnectorBaudrate(new_reception_speed)
+        self._baudrate = self.ConnectorBaudrate(new_emission_speed)
+        return self._baudrate, self.ConnectorBaudrate(new_reception_speed)
 
     def getConnectorBaudrate(self) -> ConnectorBaudrate:
         print("Not Implemented Yet")
         return None
 
     def setKeyboardMode(self, extended: bool = True, c0: bool = False) -> tuple:
-        self.getKeyboardMode()
+        return self._exchange(self._setKeyboardMode(extended=extended, c0=c0))
+
+    def _setKeyboardMode(self, extended: bool = True, c0: bool = False):
+        yield from self._getKeyboardMode()
         if self._keyboard_extended != extended:
             action = self.START
             if not extended: 
@@ -646,7 +1093,7 @@ class Minitel:
             if self.send(self.PRO3 + action + self.IO_CODES[self.Module.KEYBOARD][self.IO.IN] + self.ETEN):
                 log(ERROR, "Error while attempting to send setKeyboardMode request")
                 return None
-            answer = self.read(5)
+            answer = yield 5, self.PRO3 + self.REP_KEYBOARD_STATUS
             if answer is None or answer[0:2] != self.PRO3 or answer[2:3] != self.REP_KEYBOARD_STATUS or answer[3:4] != self.IO_CODES[self.Module.KEYBOARD][self.IO.IN]:
                 log(ERROR, "Response from setKeyboardMode's Request is invalid (got :" + str(answer.hex()) + ")")
                 return None
@@ -665,7 +1112,7 @@ class Minitel:
             if self.send(self.PRO3 + action + self.IO_CODES[self.Module.KEYBOARD][self.IO.IN] + self.C0):
                 log(ERROR, "Error while attempting to send setKeyboardMode request")
                 return None
-            answer = self.read(5)
+            answer = yield 5, self.PRO3 + self.REP_KEYBOARD_STATUS
             if answer is None or answer[0:2] != self.PRO3 or answer[2:3] != self.REP_KEYBOARD_STATUS or answer[3:4] != self.IO_CODES[self.Module.KEYBOARD][self.IO.IN]:
                 log(ERROR, "Response from setKeyboardMode's Request is invalid (got :" + str(answer.hex()) + ")")
                 return None 
@@ -680,10 +1127,13 @@ class Minitel:
         return self._keyboard_extended, self._keyboard_c0
 
     def getKeyboardMode(self) -> tuple:
+        return self._exchange(self._getKeyboardMode())
+
+    def _getKeyboardMode(self):
         if self.send(self.PRO2 + self.GET_KEYBOARD_STATUS + self.IO_CODES[self.Module.KEYBOARD][self.IO.IN]):
             log(ERROR, "Error while attempting to send getKeyboardMode request")
             return None
-        answer = self.read(5)
+        answer = yield 5, self.PRO3 + self.REP_KEYBOARD_STATUS
         if answer is None or answer[0:2] != self.PRO3 or answer[2:3] != self.REP_KEYBOARD_STATUS or answer[3:4] != self.IO_CODES[self.Module.KEYBOARD][self.IO.IN]:
             log(ERROR, "Response from getKeyboardMode's Request is invalid (got :" + str(answer.hex()) + ")")
             return None
@@ -698,36 +1148,65 @@ class Minitel:
         return self._keyboard_extended, self._keyboard_c0
 
     def enableKeyboard(self, update_cursor: bool = True) -> int:
-        res = self.unblockModule(self.Module.KEYBOARD)
-        if res is None:
-            log(ERROR, 'unblockModule failed, keyboard not enabled')
-            return -1
+        return self._exchange(self._enableKeyboard(update_cursor=update_cursor))
+
+    def _enableKeyboard(self, update_cursor: bool = True):
+        if not self._keyboard_enabled:
+            res = yield from self._unblockModule(self.Module.KEYBOARD)
+            if res is None:
+                log(ERROR, 'unblockModule failed, keyboard not enabled')
+                return -1
+            self._keyboard_enabled = True
         if update_cursor:
             if self.showCursor():
                 log(WARNING, 'Unable to show cursor on enableKeyboard')
         return 0
 
     def disableKeyboard(self, update_cursor: bool = True) -> int:
-        res = self.blockModule(self.Module.KEYBOARD)
-        if res is None:
-            log(ERROR, 'blockModule failed, keyboard not disabled')
-            return -1
+        return self._exchange(self._disableKeyboard(update_cursor=update_cursor))
+
+    def _disableKeyboard(self, update_cursor: bool = True):
+        if self._keyboard_enabled is not False:
+            res = yield from self._blockModule(self.Module.KEYBOARD)
+            if res is None:
+                log(ERROR, 'blockModule failed, keyboard not disabled')
+                return -1
+            self._keyboard_enabled = False
         if update_cursor:
             if self.hideCursor():
                 log(WARNING, 'Unable to hide cursor on disableKeyboard')
         return 0
 
     def enableEcho(self) -> int:
-        return 0 if self.unblockModule(self.Module.MODEM) is not None else -1
+        return self._exchange(self._enableEcho())
+
+    def _enableEcho(self):
+        if self._echo_enabled:
+            return 0
+        if (yield from self._unblockModule(self.Module.MODEM)) is None:
+            return -1
+        self._echo_enabled = True
+        return 0
 
     def disableEcho(self) -> int:
-        return 0 if self.blockModule(self.Module.MODEM) is not None else -1
+        return self._exchange(self._disableEcho())
+
+    def _disableEcho(self):
+        if self._echo_enabled is False:
+            return 0
+        if (yield from self._blockModule(self.Module.MODEM)) is None:
+            return -1
+        self._echo_enabled = False
+        return 0
 
     def setKeyCapsLock(self, enable: bool) -> int: 
         print("Not Implemented Yet")
         return -1
 
     def setScreenPageMode(self) -> int:
+        return self._exchange(self._setScreenPageMode())
+
+    def _setScreenPageMode(self):
         if not self._roll_mode_enabled:
             log(INFO, 'Scroll Mode already disabled.')
             return 0
@@ -737,15 +1216,19 @@ class Minitel:
         if self.send(command):
             log(ERROR, "Error while attempting to send setScreenPageMode request")
             return -1
-        answer = self.read(4)
+        answer = yield 4, self.PRO2
         if answer is None or answer[0:2] !=  self.PRO2:
             log(ERROR, 'setScreenPageMode might have failed, excepted x13x56 but got ' + answer.hex())
             return -1
 
         self._roll_mode_enabled = False
+        self._getShadow().setRollMode(False)
         return 0
 
     def setScreenRollMode(self) -> int:
+        return self._exchange(self._setScreenRollMode())
+
+    def _setScreenRollMode(self):
         if self._roll_mode_enabled:
             log(INFO, 'Scroll Mode already enabled.')
             return 0
@@ -755,12 +1238,13 @@ class Minitel:
         if self.send(command):
             log(ERROR, "Error while attempting to send setScreenRollMode request")
             return -1
-        answer = self.read(4)
+        answer = yield 4, self.PRO2
         if answer is None or answer[0:2] !=  self.PRO2:
             log(ERROR, 'setScreenRollMode might have failed, excepted x13x56 but got ' + answer.hex())
             return -1
 
         self._roll_mode_enabled = True
+        self._getShadow().setRollMode(True)
         return 0
 
     class CopyMode(Enum):
@@ -777,56 +1261,112 @@ class Minitel:
     
 
     def setTextAttributes(self, color: CharacterColor = None, blinking: bool = None, inverted = None, double_height: bool = None, double_width: bool = None) -> int:
+        return self._exchange(self._setTextAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width))
+
+    def _setTextAttributes(self, color: CharacterColor = None, blinking: bool = None, inverted = None, double_height: bool = None, double_width: bool = None):
         if self._mode == Mode.MIXED:
             log(WARNING, 'Sending Text Attributes on Mixed Video Mode will be ignored by the Minitel.')
         
         if double_height:
-            r, c = self.getCursorPosition()
+            r, c = yield from self._getCursorPosition()
             if r == 1:
                 self.newLine()
 
-        if self.send(self._text_attribute.setAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)):
+        # Text attributes stay in effect until changed: when the shadow knows the current ones, only the transition is
+        # sent, else every requested attribute is
+        if self._reconcileTextAttributes():
+            attribute = self._text_attribute.withAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)
+            data = TEXT_TRANSITIONS.get(self._text_attribute, attribute)
+        else:
+            attribute = None
+            if self._text_attribute is not None:
+                attribute = self._text_attribute.withAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)
+            data = TextAttributes._toBytes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width)
+
+        if len(data) and self.send(data):
             log(ERROR, "Error while attempting to send TextAttributes")
             return -1
+        self._text_attribute = attribute
         return 0
 
+    def _reconcileTextAttributes(self) -> bool:
+        # Take the text attributes from the shadow, which knows them once reset by what has been sent (FF, RS or US)
+        shadow = self._getShadow()
+        if not shadow.areAttributesKnown():
+            return False
+        self._text_attribute = shadow.getTextAttributes()
+        return True
+
     def resetTextAttributes(self) -> int:
         if self._mode == Mode.MIXED:
             log(WARNING, 'Sending Text Attributes on Mixed Video Mode will be ignored by the Minitel.')
         
-        return self.setTextAttributes(color=CharacterColor.WHITE, blinking=False, inverted=False, double_height=False, double_width=False)
+        # Sending every attribute, unless the attributes currently in effect are known
+        attribute = TextAttributes().intern()
+        current = None
+        if self._reconcileTextAttributes():
+            current = self._text_attribute
+        data = TEXT_TRANSITIONS.get(current, attribute)
+        if len(data) and self.send(data):
+            log(ERROR, "Error while attempting to send TextAttributes")
+            return -1
+        self._text_attribute = attribute
+        return 0
 
     def setZoneAttributes(self, color: BackgroundColor = None, masking: bool = None, highlight: bool = None):
         if self._mode == Mode.MIXED:
             log(WARNING, 'Sending Zone Attributes on Mixed Video Mode will be ignored by the Minitel.')
         
-        if self.send(self._zone_attribute.setAttributes(color=color, masking=masking, highlight=highlight)):
+        attribute = None
+        if self._zone_attribute is not None:
+            attribute = self._zone_attribute.withAttributes(color=color, masking=masking, highlight=highlight)
+
+        # Zone attributes are reset on each row, the requested ones are always sent with their delimiter
+        data = ZoneAttributes._toBytes(color=color, masking=masking, highlight=highlight)
+        if not len(data):
+            data = DELIMETER
+
+        if self.send(data):
             log(ERROR, "Error while attempting to send ZoneAttributes")
             return -1
+        self._zone_attribute = attribute
         return 0
 
     def resetZoneAttributes(self) -> int:
         if self._mode == Mode.MIXED:
             log(WARNING, 'Sending Zone Attributes on Mixed Video Mode will be ignored by the Minitel.')
 
-        return self.setZoneAttributes(color=BackgroundColor.BLACK, masking=False, highlight=False)
+        attribute = ZoneAttributes().intern()
+        if self.send(ZONE_TRANSITIONS.get(None, attribute)):
+            log(ERROR, "Error while attempting to send ZoneAttributes")
+            return -1
+        self._zone_attribute = attribute
+        return 0
 
     def maskingFullScreen(self) -> int:
         # TODO - TEST
+        if 'masking' in self._shadow_known and self._getShadow().isScreenMasked():
+            return 0
+
         byte_array = ESC + b'\x23\x20\x58'
 
         if self.send(byte_array):
             log(ERROR, "Error while attempting to send maskingFullScreen request")
             return -1
+        self._shadow_known.add('masking')
         return 0
 
     def unmaskingFullScreen(self) -> int:
         # TODO - TEST
+        if 'masking' in self._shadow_known and not self._getShadow().isScreenMasked():
+            return 0
+
         bytes_array = ESC + b'\x23\x20\x5f'
 
         if self.send(bytes_array):
             log(ERROR, "Error while attempting to send unmaskingFullScreen request")
             return -1
+        self._shadow_known.add('masking')
         return 0
 
     def invertText(self) -> int:
@@ -846,6 +1386,13 @@ class Minitel:
         if res:
             log(ERROR, "Error while attempting to send clear request")
             return -1
+
+        # Clearing the screen resets the attributes
+        self._text_attribute = TextAttributes().intern()
+        self._zone_attribute = ZoneAttributes().intern()
+        if self._mode == Mode.VIDEOTEX:
+            # FF also sets the cursor home and selects G0, the shadow now matches the screen
+            self._shadow_known.add('screen')
         return 0
 
     def newLine(self) -> int:
@@ -856,9 +1403,13 @@ class Minitel:
     
     def print(self, text: str) -> int:
         data = b''
-        for c in text:
-            data += alphanumerical.ascii_to_alphanumerical(c=c, vm=self._vm)
-        
+        # Text is sent in G0, a semi graphic page may have left G1 selected, e.g. a page the shadow didn't interpret
+        shadow = self._getShadow()
+        if not shadow.areAttributesKnown() or shadow.isG1():
+            data += b'\x0f'
+
+        data += encodeText(text, self._vm)
+
         if self.send(data):
             log(ERROR, "Error while attempting to send text")
             return -1
@@ -878,34 +1429,65 @@ class Minitel:
         self._bindings = {} 
 
     def readKeyboard(self, timeout: int = None) -> int:
-        old_timeout = self._comm.getTimeout()
-        self._comm.setTimeout(timeout)
+        self._setIdle(True)
+        try:
+            if self._demux and not self._typed_keys:
+                data = self._demux.readKey(timeout)
+            else:
+                old_timeout = self._comm.getTimeout()
+                self._comm.setTimeout(timeout)
+
+                data = self._exchange(self._readKeyboard())
+
+                self._comm.setTimeout(old_timeout)
+        finally:
+            self._setIdle(False)
 
-        data = self.read(1)
         if data is None:
-            log(ERROR, "Error while attempting to read keyboard inputs")
             return -1
-        if data[0:1] == b'\x19' or data[0:1] == b'\x13' or data[0:1] == b'\x1b':
-            res = self.read(1)
+
+        self._dispatchKeyboard(data)
+        return 0
+
+    def _readKeyboard(self):
+        # Key's bytes, empty if none before the timeout, None on error
+        # The input received along with the first byte is decoded at once, the keys typed ahead are read from memory next
+        if self._typed_keys:
+            return self._typed_keys.popleft()
+
+        data = self._typed_rest
+        while True:
+            res = yield 1, b''
             if res is None:
                 log(ERROR, "Error while attempting to read keyboard inputs")
-                return -1
-            data += res
-            if data[1:2] == b'\x4b' or data[1:2] == b'\x5b':
-                res = self.read(1)
-                if res is None:
-                    log(ERROR, "Error while attempting to read keyboard inputs")
-                    return -1
-                data += res
-                if data[2:3] == b'\x34' or data[2:3] == b'\x32':
-                    res = self.read(1)
-                    if res is None:
-                        log(ERROR, "Error while attempting to read keyboard inputs")
-                        return -1
-                    data += res
+                return None
+
+            if not len(res):
+                # Nothing else came, an incomplete code is returned as it is
+                keys, rest = KEYBOARD_DECODER.decode(data, final=True)
+                break
 
-        self._comm.setTimeout(old_timeout)
+            try:
+                data += res + self._comm.readBuffered()
+            except CommException:
+                log(ERROR, "Error while attempting to read keyboard inputs")
+                return None
 
+            # Reading on while the input ends with the start of a longer code
+            keys, rest = KEYBOARD_DECODER.decode(data)
+            if keys:
+                break
+            data = rest
+
+        self._typed_rest = rest
+        if not keys:
+            return b''
+        self._typed_keys.extend(keys[1:])
+        return keys[0]
+
+    def _dispatchKeyboard(self, data: bytes) -> list:
+        # Call the bindings matching the key, returns what the called callbacks returned
+        results = []
         callback_called = False
 
         if len(data):
@@ -913,36 +1495,249 @@ class Minitel:
 
         if len(data) == 0:
             if self._filter_bindings[FilterKeyboardCode.No_Keys] is not None:
-                self._filter_bindings[FilterKeyboardCode.No_Keys]()
-            return 0
+                results.append(self._filter_bindings[FilterKeyboardCode.No_Keys]())
+            return results
         
         if self._filter_bindings[FilterKeyboardCode.Any_Keys] is not None:
-            self._filter_bindings[FilterKeyboardCode.Any_Keys]()
+            results.append(self._filter_bindings[FilterKeyboardCode.Any_Keys]())
             callback_called = True
 
-        try:
-            char = VideotexKeyboardCode(data).char()
-        
-            if str.isprintable(char):
-                if self._filter_bindings[FilterKeyboardCode.Printable_Keys]:
-                    self._filter_bindings[FilterKeyboardCode.Printable_Keys](char)
-                    callback_called = True
-        except ValueError as e:
-            log(DEBUG, 'data is not a VideotexKeyboardCode')
+        char = KEYBOARD_DECODER.char(data)
+        if len(char) and str.isprintable(char):
+            if self._filter_bindings[FilterKeyboardCode.Printable_Keys]:
+                results.append(self._filter_bindings[FilterKeyboardCode.Printable_Keys](char))
+                callback_called = True
 
         if data in self._bindings:
             callback = self._bindings[data]
-            callback()
+            results.append(callback())
             callback_called = True
 
         if not callback_called:
             if self._filter_bindings[FilterKeyboardCode.Other_Keys]:
-                self._filter_bindings[FilterKeyboardCode.Other_Keys]()
+                results.append(self._filter_bindings[FilterKeyboardCode.Other_Keys]())
 
-        return 0
+        return results
 
     def beep(self) -> int:
         if self.send(self.BEL):
             log(ERROR, "Error while attempting to send beep request")
             return -1
         return 0
+
+
+class AsyncMinitel(Minitel):
+    '''
+    Minitel served from an asyncio event loop through an AsyncCommSocket, one coroutine per session instead of threads.
+    Commands only sending bytes are Minitel's ones, they write into the transport's buffer (see drain). The ones waiting for
+    the Minitel's answer are coroutines, running the same protocol as Minitel's.
+    '''
+
+    def __init__(self, comm: AsyncCommSocket, mode: Mode = Mode.VIDEOTEX):
+        '''
+        AsyncMinitel's constructor, nothing is exchanged before initialize is awaited.
+
+            Parameters:
+                comm (AsyncCommSocket): Comm of the Minitel's connection
+                mode (Mode): Minitel's Mode set by initialize - Default is Videotex (standard mode)
+        '''
+        self._initAttributes()
+
+        self._comm = comm
+        self._initial_mode = mode
+
+        self._text_attribute = TextAttributes().intern()
+        self._zone_attribute = ZoneAttributes().intern()
+
+        self._bindings = {}
+        self._loop = None
+
+    def __del__(self):
+        # The connection is closed by close, its event loop may be gone by now
+        pass
+
+    def post(self, data: bytes) -> int:
+        '''
+        Queue bytes sent from another thread or coroutine than the Minitel's: they are written from the event loop while
+        the Minitel's coroutine waits for a key, or else once its current batch is sent, never between its own sends.
+        The screen's shadow and the attributes in effect are no longer trusted, the bytes are expected to position
+        themselves and leave G0 selected.
+
+            Parameters:
+                data (bytes): Bytes to send
+
+            Returns:
+                0 on success, -1 otherwise
+        '''
+        if self._comm.stopped():
+            return -1
+
+        with self._posted_lock:
+            self._posted.append(data)
+            if self._idle:
+                # The transport isn't thread-safe, the bytes are written from the event loop
+                try:
+                    self._loop.call_soon_threadsafe(self._writeIdle)
+                except RuntimeError as e:
+                    log(ERROR, 'Got Exception while attempting to post message - ' + str(e))
+                    return -1
+
+        return 0
+
+    def _setIdle(self, idle: bool):
+        # Called from the event loop, while the Minitel's coroutine waits for a key the bytes posted are written from it
+        self._loop = asyncio.get_running_loop()
+        super()._setIdle(idle)
+
+    def _writeIdle(self):
+        # Once the key is read, the bytes posted wait for the next boundary between the Minitel's messages
+        with self._posted_lock:
+            if self._idle:
+                self._writePosted()
+
+    async def initialize(self) -> "AsyncMinitel":
+        '''
+        Retrieve the basic minitel's information and set its mode - Raises MinitelException if the Minitel doesn't answer.
+        '''
+        timeout = self._comm.getTimeout()
+        if timeout is None:
+            self._comm.setTimeout(10)
+
+        res = await self._exchange(self._handshake(self._initial_mode))
+
+        self._comm.setTimeout(timeout)
+
+        if not res:
+            log(ERROR, 'Unable to communicate with the minitel.')
+            raise MinitelException
+
+        return self
+
+    async def close(self):
+        await self._comm.waitClosed()
+
+    async def read(self, n: bytes, prefix: bytes = b'') -> bytes:
+        self._flushBatch()
+        try:
+            return await self._comm.read(n)
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to read message - ' + str(e))
+            return None
+
+    async def drain(self) -> int:
+        '''
+        Wait for the bytes sent to be written, as long as the transport's buffer is above its high-water mark.
+        '''
+        try:
+            await self._comm.drain()
+        except CommException as e:
+            log(ERROR, 'Got Exception while attempting to send message - ' + str(e))
+            return -1
+        return 0
+
+    async def sendStream(self, chunks) -> int:
+        self._forgetScreen()
+        for chunk in chunks:
+            if self._put(chunk) or await self.drain():
+                return -1
+
+        return 0
+
+    def startInputDemux(self) -> InputDemux:
+        log(ERROR, 'No input demultiplexer on asyncio streams, queries are awaited in turn')
+        return None
+
+    async def pipeline(self, *queries) -> list:
+        return [await self._exchange(protocol) for protocol in self._protocols(queries)]
+
+    async def _exchange(self, protocol):
+        try:
+            expected = next(protocol)
+            while True:
+                expected = protocol.send(await self.read(*expected))
+        except StopIteration as result:
+            return result.value
+
+    async def switchReceiverTransmitter(self, receiver: Minitel.Module, transmitter: Minitel.Module, on: bool = True) -> dict:
+        return await self._exchange(self._switchReceiverTransmitter(receiver=receiver, transmitter=transmitter, on=on))
+
+    async def blockModule(self, module: Minitel.Module) -> bool:
+        return await self._exchange(self._blockModule(module=module))
+
+    async def unblockModule(self, module: Minitel.Module) -> bool:
+        return await self._exchange(self._unblockModule(module=module))
+
+    async def getModuleIOStatus(self, module: Minitel.Module, io: Minitel.IO) -> dict:
+        return await self._exchange(self._getModuleIOStatus(module=module, io=io))
+
+    async def getProtocolStatus(self) -> dict:
+        return await self._exchange(self._getProtocolStatus())
+
+    async def setProtocolTransparency(self, n: int) -> int:
+        return await self._exchange(self._setProtocolTransparency(n=n))
+
+    async def getMinitelInfo(self) -> tuple:
+        return await self._exchange(self._getMinitelInfo())
+
+    async def getModuleOperatingModeStatus(self) -> tuple:
+        return await self._exchange(self._getModuleOperatingModeStatus())
+
+    async def setVideoMode(self, mode: Mode = Mode.VIDEOTEX) -> int:
+        return await self._exchange(self._setVideoMode(mode=mode))
+
+    async def getCursorPosition(self) -> tuple:
+        return await self._exchange(self._getCursorPosition())
+
+    async def setConnectorBaudrate(self, emission_baudrate = Minitel.ConnectorBaudrate.BAUDS_1200, reception_baudrate = Minitel.ConnectorBaudrate.BAUDS_1200) -> tuple:
+        log(ERROR, "Baudrate not handled for socket comm")
+        return None
+
+    async def setKeyboardMode(self, extended: bool = True, c0: bool = False) -> tuple:
+        return await self._exchange(self._setKeyboardMode(extended=extended, c0=c0))
+
+    async def getKeyboardMode(self) -> tuple:
+        return await self._exchange(self._getKeyboardMode())
+
+    async def enableKeyboard(self, update_cursor: bool = True) -> int:
+        return await self._exchange(self._enableKeyboard(update_cursor=update_cursor))
+
+    async def disableKeyboard(self, update_cursor: bool = True) -> int:
+        return await self._exchange(self._disableKeyboard(update_cursor=update_cursor))
+
+    async def enableEcho(self) -> int:
+        return await self._exchange(self._enableEcho())
+
+    async def disableEcho(self) -> int:
+        return await self._exchange(self._disableEcho())
+
+    async def setScreenPageMode(self) -> int:
+        return await self._exchange(self._setScreenPageMode())
+
+    async def setScreenRollMode(self) -> int:
+        return await self._exchange(self._setScreenRollMode())
+
+    async def setTextAttributes(self, color: CharacterColor = None, blinking: bool = None, inverted = None, double_height: bool = None, double_width: bool = None) -> int:
+        return await self._exchange(self._setTextAttributes(color=color, blinking=blinking, inverted=inverted, double_height=double_height, double_width=double_width))
+
+    async def readKeyboard(self, timeout: int = None) -> int:
+        '''
+        Read a key and call its bindings, which may be coroutine functions.
+        '''
+        self._setIdle(True)
+        try:
+            old_timeout = self._comm.getTimeout()
+            self._comm.setTimeout(timeout)
+
+            data = await self._exchange(self._readKeyboard())
+
+            self._comm.setTimeout(old_timeout)
+        finally:
+            self._setIdle(False)
+
+        if data is None:
+            return -1
+
+        for result in self._dispatchKeyboard(data):
+            if inspect.isawaitable(result):
+                await result
+        return 0
@@ -0,0 +1,168 @@
+from concurrent.futures import Future
+from collections import OrderedDict
+from threading import Lock
+from logging import log, ERROR, DEBUG
+
+import time
+
+
+class RenderCache:
+    '''
+    Byte streams of pages rendered from data shared by the sessions, e.g. read from Redis, by page id, data version and
+    Visualization Module.
+    A stream is rendered once per data version: sessions asking for it meanwhile wait for the first one's render instead of
+    rendering it too.
+    Streams expire after ttl seconds, the least recently used ones are evicted above max_size bytes.
+    '''
+
+    def __init__(self, max_size: int = 1024 * 1024, ttl: float = 60):
+        '''
+        RenderCache's constructor.
+
+            Parameters:
+                max_size (int): Bytes of streams kept, streams larger aren't kept - Default 1 MiB
+                ttl (float): Seconds a stream is kept after being rendered, None keeps it until evicted - Default 60
+        '''
+        self._max_size = max_size
+        self._ttl = ttl
+
+        self._lock = Lock()
+        # (stream, expiry) by key, least recently used first
+        self._streams = OrderedDict()
+        self._size = 0
+        # Futures of the renders running, by key
+        self._renders = {}
+
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, page_id: str, version, vm, render) -> bytes:
+        '''
+        Get a page's stream, rendering it if it isn't cached.
+
+            Parameters:
+                page_id (str): Identifies the page and its parameters, e.g. 'planets:2'
+                version: Hashable identifying the data rendered, e.g. a counter or the data itself
+                vm (VisualizationModule): Visualization Module the stream is rendered for
+                render (Callable[[], bytes]): Renders the stream
+
+            Returns:
+                stream (bytes): The rendered stream, None if render failed
+        '''
+        key = (page_id, version, vm)
+        stream, future = self._lookup(key)
+        if stream is not None:
+            return stream
+        if future is not None:
+            return future.result()
+
+        try:
+            stream = bytes(render())
+        except Exception as e:
+            log(ERROR, 'Unable to render ' + str(page_id) + ' - ' + str(e))
+        finally:
+            self._rendered(key, stream)
+
+        return stream
+
+    def iterate(self, page_id: str, version, vm, render):
+        '''
+        Get a page's stream chunk by chunk, e.g. for Minitel.sendStream: when it isn't cached, the chunks are yielded as
+        render produces them and cached once all are.
+
+            Parameters:
+                page_id (str): Identifies the page and its parameters, e.g. 'planets:2'
+                version: Hashable identifying the data rendered, e.g. a counter or the data itself
+                vm (VisualizationModule): Visualization Module the stream is rendered for
+                render (Callable[[], Iterable[bytes]]): Renders the stream's chunks, e.g. with Videotex.iterVideotex
+
+            Returns:
+                Generator of the stream's chunks, the whole stream once cached - Nothing if render failed
+        '''
+        key = (page_id, version, vm)
+        stream, future = self._lookup(key)
+        if stream is not None or future is not None:
+            # Cached or rendered by another session: yielded whole, nothing if its render failed
+            stream = stream if future is None else future.result()
+            if stream:
+                yield stream
+            return
+
+        chunks = []
+        try:
+            for chunk in render():
+                chunk = bytes(chunk)
+                chunks.append(chunk)
+                yield chunk
+            stream = b''.join(chunks)
+        except Exception as e:
+            log(ERROR, 'Unable to render ' + str(page_id) + ' - ' + str(e))
+        finally:
+            # Also when the consumer stops early, the sessions waiting for the render get None
+            self._rendered(key, stream)
+
+    def invalidate(self, page_id: str = None):
+        '''
+        Drop a page's streams, every stream if page_id is None.
+        '''
+        with self._lock:
+            for key in [key for key in self._streams if page_id is None or key[0] == page_id]:
+                self._size -= len(self._streams.pop(key)[0])
+
+    def cacheInfo(self) -> dict:
+        '''
+        Returns the hits, misses, streams count and their size in bytes.
+        '''
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'streams': len(self._streams),
+                'size': self._size,
+            }
+
+    def _lookup(self, key: tuple) -> tuple:
+        # (stream, None) if cached, (None, future) if another session renders it, (None, None) if the caller must
+        with self._lock:
+            entry = self._streams.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._streams.move_to_end(key)
+                self._hits += 1
+                return entry[0], None
+
+            future = self._renders.get(key)
+            if future is not None:
+                self._hits += 1
+                return None, future
+
+            self._renders[key] = Future()
+            self._misses += 1
+            return None, None
+
+    def _rendered(self, key: tuple, stream: bytes):
+        with self._lock:
+            future = self._renders.pop(key)
+            if stream is not None:
+                self._store(key, stream)
+        future.set_result(stream)
+
+    def _store(self, key: tuple, stream: bytes):
+        if key in self._streams:
+            self._size -= len(self._streams.pop(key)[0])
+
+        if len(stream) > self._max_size:
+            log(DEBUG, 'Stream of ' + str(key[0]) + ' not cached: ' + str(len(stream)) + ' bytes')
+            return
+
+        now = time.monotonic()
+        expiry = None if self._ttl is None else now + self._ttl
+        self._streams[key] = (stream, expiry)
+        self._size += len(stream)
+
+        # Expired streams first, then the least recently used
+        for old_key in [old_key for old_key, (_, old_expiry) in self._streams.items() if old_expiry is not None and old_expiry <= now]:
+            self._size -= len(self._streams.pop(old_key)[0])
+
+        while self._size > self._max_size:
+            _, (old_stream, _) = self._streams.popitem(last=False)
+            self._size -= len(old_stream)
@@ -0,0 +1,233 @@
+from pyminitel.visualization_module import VisualizationModule
+
+from threading import Thread, Event, Lock
+from logging import log, ERROR, DEBUG, INFO
+from select import select
+
+import os, sys, struct, ctypes, ctypes.util
+
+# inotify's events reloading a file: written and closed, or moved in place (an atomic write's rename)
+IN_CLOSE_WRITE = 0x08
+IN_MOVED_TO = 0x80
+
+# inotify_event's header: wd, mask, cookie and len, followed by the name
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class ResourceStore:
+    '''
+    Videotex files (.VDT) of a directory, read on their first use and shared by every session of the process: the pages
+    are read from disk once and sessions send the same immutable bytes.
+    They are read rather than memory-mapped, a file truncated while mapped would crash the process on its next read.
+    Once watched (see watch), a file written again is read again and swapped in: the next get returns the new content
+    while the bytes already handed out keep the old one.
+    '''
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._lock = Lock()
+        # Contents of the files and the stat they were read at, by file name
+        self._contents = {}
+        self._signatures = {}
+        self._watcher = None
+
+    def getDirectory(self) -> str:
+        return self._directory
+
+    def get(self, name: str, vm: VisualizationModule = None) -> bytes:
+        '''
+        Get a Videotex file's content.
+
+            Parameters:
+                name (str): File name without extension, e.g. 'GUIDE' or 'HAIKU'
+                vm (VisualizationModule): When given, the file generated for it by Videotex.toVideotexFile is looked for
+                                          first, e.g. 'GUIDE_VGP5_.VDT' - Default None
+
+            Returns:
+                data (bytes): The file's bytes, to be sent as is - None if the file is not found
+        '''
+        for filename in self._filenames(name, vm):
+            content = self._contents.get(filename)
+            if content is not None:
+                return content
+
+            filepath = os.path.join(self._directory, filename)
+            if os.path.exists(filepath):
+                return self._read(filename, filepath)
+
+        log(ERROR, 'File not found: ' + os.path.join(self._directory, name) + '.VDT')
+        return None
+
+    def reload(self, filename: str) -> bool:
+        '''
+        Read a file again if it changed since it was read, files never got are left to be read on their first use.
+        A removed file's content is kept until a new one is written.
+
+            Parameters:
+                filename (str): File name, e.g. 'GUIDE_VGP5_.VDT'
+
+            Returns:
+                reloaded (bool): True if the new content is swapped in
+        '''
+        if filename not in self._contents:
+            return False
+
+        filepath = os.path.join(self._directory, filename)
+        try:
+            signature = _signature(os.stat(filepath))
+        except OSError:
+            return False
+
+        if signature == self._signatures.get(filename):
+            return False
+
+        if self._read(filename, filepath, replace=True) is None:
+            return False
+
+        log(INFO, 'Reloaded ' + filepath)
+        return True
+
+    def watch(self) -> "ResourceWatcher":
+        '''
+        Start reloading the files when they are written again, e.g. by the page generation scripts.
+
+            Returns:
+                watcher (ResourceWatcher): The running watcher
+        '''
+        with self._lock:
+            if self._watcher is None or self._watcher.stopped():
+                self._watcher = ResourceWatcher(self)
+                self._watcher.start()
+            return self._watcher
+
+    def unwatch(self):
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher:
+            watcher.stop()
+            watcher.join()
+
+    def _filenames(self, name: str, vm: VisualizationModule) -> list:
+        filenames = [name + '.VDT']
+        if vm is not None:
+            vm_str = 'VGP5' if vm == VisualizationModule.VGP5 else 'VGP2'
+            filenames.insert(0, name + '_' + vm_str + '_.VDT')
+        return filenames
+
+    def _read(self, filename: str, filepath: str, replace: bool = False) -> bytes:
+        with self._lock:
+            # Read by another session meanwhile
+            if filename in self._contents and not replace:
+                return self._contents[filename]
+
+            try:
+                with open(filepath, 'rb') as binary_file:
+                    stat = os.fstat(binary_file.fileno())
+                    content = binary_file.read()
+            except OSError as e:
+                log(ERROR, 'Unable to read ' + filepath + ' - ' + str(e))
+                return None
+
+            log(DEBUG, 'Read ' + filepath + ': ' + str(len(content)) + ' bytes')
+            self._contents[filename] = content
+            self._signatures[filename] = _signature(stat)
+            return content
+
+
+class ResourceWatcher(Thread):
+    '''
+    Reloads the files of a ResourceStore written again, with inotify on Linux.
+    Elsewhere, or if inotify is unavailable, the read files' stats are polled.
+    Each reload reads the file into new bytes swapped into the store, sessions sending the old ones are unaffected.
+    A file written in place (e.g. by cp or an editor) may be read half-written, it is read again once closed: writers
+    should rather write aside then rename, like Videotex.toVideotexFile.
+    '''
+
+    # Interval (s) at which the stop is checked and, without inotify, the files polled
+    POLL_INTERVAL = 1
+
+    def __init__(self, store: ResourceStore):
+        self._store = store
+        self._stop_event = Event()
+        self._fd = _inotifyWatch(store.getDirectory())
+        super().__init__(daemon=True)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def run(self):
+        try:
+            while not self.stopped():
+                if self._fd is None:
+                    self._stop_event.wait(self.POLL_INTERVAL)
+                    filenames = list(self._store._contents)
+                else:
+                    filenames = self._readEvents()
+
+                for filename in filenames:
+                    self._store.reload(filename)
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _readEvents(self) -> set:
+        # Names of the files written, empty if none before POLL_INTERVAL
+        ready, _, _ = select([self._fd], [], [], self.POLL_INTERVAL)
+        if not ready:
+            return set()
+
+        data = os.read(self._fd, 4096)
+        filenames = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            filenames.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return filenames
+
+
+def _signature(stat: os.stat_result) -> tuple:
+    # Changes when a file is written again or replaced
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def _inotifyWatch(directory: str) -> int:
+    # inotify's file descriptor watching the directory, None if unavailable
+    if not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError) as e:
+        log(ERROR, 'inotify unavailable, polling ' + directory + ' - ' + str(e))
+        return None
+
+    if fd < 0:
+        log(ERROR, 'inotify unavailable, polling ' + directory + ' - ' + os.strerror(ctypes.get_errno()))
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        log(ERROR, 'Unable to watch ' + directory + ', polling it - ' + os.strerror(ctypes.get_errno()))
+        os.close(fd)
+        return None
+
+    return fd
+
+
+_stores = {}
+_stores_lock = Lock()
+
+def getResourceStore(directory: str) -> ResourceStore:
+    '''
+    Returns the process-wide ResourceStore of a directory, created on the first call.
+    '''
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ResourceStore(directory)
+        return _stores[key]
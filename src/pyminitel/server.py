@@ -0,0 +1,193 @@
+from pyminitel.minitel import Minitel, MinitelException
+from pyminitel.page import Page
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, BoundedSemaphore
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR
+from logging import log, ERROR, WARNING, INFO, DEBUG
+
+import inspect
+
+
+class Session:
+    '''
+    A Minitel connected to the server, served by one of its workers until the handler returns.
+    '''
+
+    def __init__(self, server: "MinitelServer", tcp: socket, address: tuple):
+        self.server = server
+        self.address = address
+        self.minitel = None
+
+        self._tcp = tcp
+        self._page = None
+        self._stop_event = Event()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._page:
+            self._page.stop()
+
+    def stopped(self) -> bool:
+        '''
+        Returns True once the session or the server is stopped, handlers looping on the Minitel's input check it.
+        '''
+        return self._stop_event.is_set() or self.server.stopped()
+
+    def runPage(self, page: Page):
+        '''
+        Run a page in the calling thread, e.g. a service opened from the handler's menu, stopping it with the session.
+        The page shown before is the session's again once it returns.
+        '''
+        previous, self._page = self._page, page
+        try:
+            if self.stopped():
+                page.stop()
+            page.run()
+        finally:
+            self._page = previous
+
+    def close(self):
+        # The Minitel joins its Comm's thread, the socket is closed even if no Minitel answered
+        if self.minitel:
+            self.minitel.close()
+            self.minitel = None
+        self._tcp.close()
+
+
+class MinitelServer:
+    '''
+    TCP server serving each connected Minitel (e.g. through a serial-to-TCP bridge) with a handler, run by a bounded pool
+    of workers.
+    At most max_sessions Minitels are served at once, the connections above are refused: threads, sockets and memory
+    stay bounded at peak load.
+    '''
+
+    # Interval (s) at which the listener checks whether the server is shut down
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, handler, host: str = '0.0.0.0', port: int = 8083, max_sessions: int = 32, workers: int = None, backlog: int = 16, timeout: float = None, baudrate = Minitel.ConnectorBaudrate.BAUDS_1200, busy_message: bytes = None):
+        '''
+        MinitelServer's constructor - Binds the listening socket.
+
+            Parameters:
+                handler: Called with each Session once its Minitel answered, the session ends when it returns
+                         - A Page subclass is instantiated with the session's Minitel and run by the worker
+                host (str): Address to listen on - Default is every interface
+                port (int): Port to listen on, 0 picks a free one (see getAddress) - Default 8083
+                max_sessions (int): Sessions served at once, connections above are refused - Default 32
+                workers (int): Threads running the sessions' handlers, admitted sessions wait for one - Default is max_sessions
+                backlog (int): Connections the OS queues until they are accepted - Default 16
+                timeout (float): Sessions' Comm timeout (default None)
+                baudrate (Minitel.ConnectorBaudrate): Minitels' connector baudrate the sessions' writes are paced at - None doesn't pace them, Default 1200
+                busy_message (bytes): Sent to the refused connections before closing them, e.g. Videotex text - Default None
+        '''
+        self._handler = handler
+        self._max_sessions = max_sessions
+        self._timeout = timeout
+        self._baudrate = baudrate
+        self._busy_message = busy_message
+
+        self._stop_event = Event()
+        self._slots = BoundedSemaphore(max_sessions)
+        self._lock = Lock()
+        self._sessions = set()
+        self._workers = ThreadPoolExecutor(max_workers=workers or max_sessions, thread_name_prefix='minitel-session')
+
+        self._socket = socket(AF_INET, SOCK_STREAM)
+        self._socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._socket.listen(backlog)
+        self._socket.settimeout(self.POLL_INTERVAL)
+
+    def getAddress(self) -> tuple:
+        return self._socket.getsockname()
+
+    def getSessionCount(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def shutdown(self):
+        '''
+        Stop accepting connections and ask the sessions to end, serveForever returns once they have.
+        '''
+        self._stop_event.set()
+        with self._lock:
+            for session in self._sessions:
+                session.stop()
+
+    def serveForever(self):
+        '''
+        Accept the connections until shutdown is called, then wait for the sessions to end.
+        '''
+        log(INFO, 'Server listening on ' + str(self.getAddress()))
+        try:
+            while not self.stopped():
+                try:
+                    tcp, address = self._socket.accept()
+                except TimeoutError:
+                    continue
+                except OSError as e:
+                    if not self.stopped():
+                        log(ERROR, 'Unable to accept connection - ' + str(e))
+                    continue
+
+                self._admit(tcp, address)
+        finally:
+            self.shutdown()
+            self._socket.close()
+            self._workers.shutdown(wait=True)
+            log(INFO, 'Server stopped')
+
+    def _admit(self, tcp: socket, address: tuple):
+        if not self._slots.acquire(blocking=False):
+            log(WARNING, 'Connection refused, ' + str(self._max_sessions) + ' sessions running: ' + str(address))
+            try:
+                if self._busy_message:
+                    tcp.sendall(self._busy_message)
+            except OSError:
+                pass
+            tcp.close()
+            return
+
+        session = Session(self, tcp, address)
+        with self._lock:
+            self._sessions.add(session)
+        log(INFO, 'New session: ' + str(address))
+
+        try:
+            self._workers.submit(self._serve, session)
+        except RuntimeError:
+            # Shut down meanwhile
+            self._release(session)
+
+    def _serve(self, session: Session):
+        try:
+            if session.stopped():
+                return
+
+            try:
+                session.minitel = Minitel(None, baudrate=self._baudrate, timeout=self._timeout, tcp=session._tcp)
+            except MinitelException:
+                log(ERROR, 'No Minitel answered on ' + str(session.address))
+                return
+
+            if inspect.isclass(self._handler) and issubclass(self._handler, Page):
+                # Run by the worker rather than in a thread of its own
+                session.runPage(self._handler(session.minitel))
+            else:
+                self._handler(session)
+        except Exception as e:
+            log(ERROR, 'Session ' + str(session.address) + ' caught Exception: ' + str(e))
+        finally:
+            self._release(session)
+
+    def _release(self, session: Session):
+        session.close()
+        with self._lock:
+            self._sessions.discard(session)
+        self._slots.release()
+        log(DEBUG, 'Session ended: ' + str(session.address))
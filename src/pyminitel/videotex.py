@@ -1,106 +1,309 @@
-from pyminitel.attributes import ZoneAttributes, TextAttributes
-from pyminitel.layout import Layout
-from pyminitel.alphanumerical import ascii_to_alphanumerical
+from pyminitel.attributes import ZoneAttributes, TextAttributes, TEXT_TRANSITIONS, ZONE_TRANSITIONS, DELIMETER
+from pyminitel.layout import Layout, CursorPlanner
+from pyminitel.videotex_codec import encodeCharacter
 from pyminitel.visualization_module import VisualizationModule
 from pyminitel.mode import RESOLUTION, Mode
 
 from logging import *
+from array import array
 import os
-import copy
 
 class Videotex:
 
+    # Longest run of skipped cells considered for being written again instead of moving the cursor
+    REWRITE_MAX = 6
+
     def __init__(self) -> None:
         
         self._screen_height = RESOLUTION[Mode.VIDEOTEX][0] - 1
         self._screen_width = RESOLUTION[Mode.VIDEOTEX][1]
 
-        self.zone_attributes_buf = [[ZoneAttributes() for _ in range(self._screen_width)] for _ in range(self._screen_height)]
-        self.text_attributes_buf = [[TextAttributes() for _ in range(self._screen_width)] for _ in range(self._screen_height)]
+        # Cells mutated since the last update, per row: {r: {c: (zone, text, char) as last updated}}
+        self._dirty = {}
+
+        self._allocate()
+
+    def _allocate(self):
+        self.zone_attributes_buf = [[ZoneAttributes().intern()] * self._screen_width for _ in range(self._screen_height)]
+        self.text_attributes_buf = [[TextAttributes().intern()] * self._screen_width for _ in range(self._screen_height)]
         self.text_buf = [['' for _ in range(self._screen_width)] for _ in range(self._screen_height)]
 
+    def _row(self, r: int) -> tuple:
+        # Zone attributes, text attributes and characters of the row r (0 based)
+        return self.zone_attributes_buf[r], self.text_attributes_buf[r], self.text_buf[r]
+
+    def _cell(self, r: int, c: int) -> tuple:
+        return self.zone_attributes_buf[r][c], self.text_attributes_buf[r][c], self.text_buf[r][c]
+
+    def _touch(self, r: int, c: int):
+        # Keep the cell as it was on the last update, on its first mutation since then
+        row = self._dirty.get(r)
+        if row is None:
+            row = self._dirty[r] = {}
+        if c not in row:
+            row[c] = self._cell(r, c)
+
+    def _setChar(self, r: int, c: int, char: str):
+        self._touch(r, c)
+        self.text_buf[r][c] = char
+
+    def _setTextAttributes(self, r: int, c: int, attribute: TextAttributes):
+        self._touch(r, c)
+        self.text_attributes_buf[r][c] = attribute.intern()
+
+    def _setZoneAttributes(self, r: int, c: int, attribute: ZoneAttributes):
+        self._touch(r, c)
+        self.zone_attributes_buf[r][c] = attribute.intern()
 
     def toVideotex(self, vm: VisualizationModule) -> bytes:
-        data = b''
+        return self._encode(vm=vm)
 
-        previous_zone = ZoneAttributes()
-        previous_text = TextAttributes()
+    def iterVideotex(self, vm: VisualizationModule):
+        '''
+        Encode the page row by row, so that the first rows can be sent while the next ones are encoded.
 
-        skip = False
+            Parameters:
+                vm (VisualizationModule): Visualization module of the targeted Minitel
 
-        char_double_w_inline = False;
-        last_skip_r, last_skip_c = None, None
+            Returns:
+                Generator of Videotex bytes, one chunk per row - Their concatenation is toVideotex's result
+        '''
+        return self._iterEncode(vm=vm)
+
+    def diffTo(self, previous: "Videotex", vm: VisualizationModule) -> bytes:
+        '''
+        Encode only the bytes turning the screen "previous" (as currently displayed by the Minitel) into this one.
+        Rows are compared whole first, only the differing ones are walked cell by cell, text, text attributes and zone
+        attributes included.
+
+            Parameters:
+                previous (Videotex): Screen currently displayed - When None the whole page is encoded
+                vm (VisualizationModule): Visualization module of the targeted Minitel
+
+            Returns:
+                Videotex bytes of the update, empty if both screens are identical
+        '''
+        if previous is None:
+            return self.toVideotex(vm)
+
+        if previous._screen_height != self._screen_height or previous._screen_width != self._screen_width:
+            log(ERROR, 'Unable to diff Videotex of different sizes, encoding the whole page.')
+            return self.toVideotex(vm)
+
+        # Any screen may be given, neither page's mutations since its last update tell where they differ
+        return self._encode(vm=vm, previous=previous, rows=self._differingRows(previous))
+
+    def _differingRows(self, previous: "Videotex") -> list:
+        return [r for r in range(self._screen_height) if self._row(r) != previous._row(r)]
+
+    def toVideotexUpdate(self, vm: VisualizationModule) -> bytes:
+        '''
+        Encode only the cells mutated since the last update, then start a new one.
+        Only the mutated rows are walked. The first update of a page draws it on a cleared screen.
+
+            Parameters:
+                vm (VisualizationModule): Visualization module of the targeted Minitel
+
+            Returns:
+                Videotex bytes of the update, empty if nothing changed
+        '''
+        dirty, self._dirty = self._dirty, {}
+        return self._encode(vm=vm, previous=_LastUpdate(self, dirty), rows=sorted(dirty))
+
+    def isDirty(self) -> bool:
+        return len(self._dirty) > 0
+
+    def markClean(self):
+        '''
+        Start a new update without encoding the previous one, e.g. once the whole page has been sent with toVideotex.
+        '''
+        self._dirty = {}
+
+    def _encode(self, vm: VisualizationModule, previous: "Videotex" = None, rows: list = None) -> bytes:
+        data = b''.join(self._iterEncode(vm=vm, previous=previous, rows=rows))
+
+        log(DEBUG, 'VDT generated:' + data.hex())
+        return data
+
+    def _iterEncode(self, vm: VisualizationModule, previous: "Videotex" = None, rows: list = None):
+        # Row's bytes, yielded then cleared at the end of each row
+        data = bytearray()
+
+        default_text = TextAttributes().intern()
+        default_zone = ZoneAttributes().intern()
+
+        pen_text = default_text
+
+        # A page is drawn from the home position, on a delta the cursor position is unknown
+        cursor = CursorPlanner(height=self._screen_height, width=self._screen_width)
+        if previous is None:
+            cursor = CursorPlanner(1, 1, height=self._screen_height, width=self._screen_width)
+
+        # Run of identical characters not written yet, sent with REP when shorter
+        run, run_count = b'', 0
+
+        def flush():
+            nonlocal data, run, run_count
+            if run_count:
+                data += Layout.repeatCharacter(run, run_count, vm)
+            run, run_count = b'', 0
+
+        for r in range(self._screen_height) if rows is None else rows:
+            zones, texts, chars = self._row(r)
+            if previous is not None:
+                old_zones, old_texts, old_chars = previous._row(r)
+
+            # Zone validated by the last delimiter written on the row
+            pen_zone = default_zone
+
+            # Once a zone is declared again, CAN has blanked the end of the row which has to be entirely rewritten
+            full_row = previous is None
+
+            def write(c: int, text: TextAttributes, char: str = None):
+                # Write the character, or the zone delimiter when char is None, at the cell c
+                nonlocal data, pen_text, pen_zone, run, run_count
+
+                if char is not None:
+                    encoded = encodeCharacter(char, vm)
+                    if run_count and encoded == run and pen_text is text and cursor.position() == (r + 1, c + 1):
+                        run_count += 1
+                        cursor.advance(exact=not text.double_width)
+                        return
+
+                flush()
+
+                if cursor.position() != (r + 1, c + 1):
+                    rewrite = self._rewrite(cursor, r, c, zones, texts, chars, pen_text, pen_zone, vm)
+
+                    # US and RS reset the attributes, only used where the default zone is in effect
+                    reset_cost = None
+                    if char is None or zones[c] is default_zone:
+                        reset_cost = len(TEXT_TRANSITIONS.get(default_text, text)) - len(TEXT_TRANSITIONS.get(pen_text, text))
+
+                    move, reset = cursor.moveTo(r + 1, c + 1, rewrite=rewrite, reset_cost=reset_cost)
+                    log(DEBUG, 'move(r=' + str(r + 1) + ', c=' + str(c + 1) +')=' + move.hex())
+                    data += move
+                    if reset:
+                        pen_text = default_text
+                        pen_zone = default_zone
+
+                data += TEXT_TRANSITIONS.get(pen_text, text)
+                pen_text = text
+
+                if char is None:
+                    declaration = ZONE_TRANSITIONS.get(pen_zone, zones[c])
+                    data += declaration if len(declaration) else DELIMETER
+                    pen_zone = zones[c]
+                else:
+                    run, run_count = encoded, 1
+
+                # Double width characters shift the row, the position is only assumed until the next absolute move
+                cursor.advance(exact=not text.double_width)
+
+            def blank(c: int) -> TextAttributes:
+                # Text attributes CAN fills the cell c with: the ones of its zone's delimiter, the default ones without
+                d = c
+                while d > 0 and zones[d - 1] is zones[c]:
+                    d -= 1
+                return texts[d] if zones[c] is not (zones[d - 1] if d else default_zone) else default_text
 
-        for r in range(self._screen_height):
             for c in range(self._screen_width):
-                zone = self.zone_attributes_buf[r][c]
-                text = self.text_attributes_buf[r][c]
-                char = self.text_buf[r][c]
-
-                # Update Text only
-                text_diff = previous_text.diff(text)
-                if len(text_diff):
-                    log(ERROR, 'r:' + str(r) + ' c:' +str(c) + ' diff:' + str(text_diff.hex()))
-                data += text_diff
-                if text.double_width:
-                    char_double_w_inline = True
-                
-
-                # Update Zone
-                diff = previous_zone.diff(zone)
-
-                if len(diff):
+                zone = zones[c]
+                text = texts[c]
+                char = chars[c][0:1]
+
+                delimiter = zone is not (zones[c - 1] if c else default_zone)
+
+                # The zone of the terminal's cell changes without a delimiter, CAN then blanks the end of the row
+                ending = False
+
+                if not full_row:
+                    if zone is not old_zones[c] or delimiter and text is not old_texts[c]:
+                        # The delimiter's text attributes also apply to the blanks filled by CAN
+                        full_row = True
+                        ending = not delimiter
+                    elif delimiter:
+                        # Unchanged declaration
+                        continue
+                    elif char == old_chars[c][0:1] and (char == '' or old_texts[c] is text):
+                        continue
+
+                    if char == '' and not delimiter:
+                        # Erasing the old character as CAN filled it
+                        char = ' '
+                        text = blank(c)
+                elif not delimiter and char == '':
+                    continue
+
+                if delimiter:
                     if char != ' ' and char != '':
                         log(WARNING, "Minitel requires a withspace on zone's declaration, ignoring char (r=" + str(r) + " c=" + str(c) +")")
-                    char = ''
-                
-                # Write char or Zone updating
-                if len(char) or len(diff):
-                    if len(char) > 1:
-                        char = char[0:1]
-                    if skip:
-                        log(DEBUG, 'setCursorPostion(r=' + str(r) + ', c=' + str(c) +')')
-                        if r == last_skip_r and not char_double_w_inline:
-                            data += Layout.moveCursorRight(c - last_skip_c)
-                        elif c == last_skip_c:
-                            data += Layout.moveCursorDown(r - last_skip_r)
-                        else:
-                            data += Layout.setCursorPosition(r + 1, c + 1)
-                        skip = False
-
-                    log(DEBUG, 'diff=' + diff.hex() + ' ,char=' + char)
-                    data += diff 
-                    if len(diff):
+
+                    write(c, text)
+                    # In the last column the delimiter already moved the cursor to the next row
+                    if c + 1 < self._screen_width:
                         data += Layout.fillLine()
-                    if len(char):
-                        data += ascii_to_alphanumerical(c=char, vm=vm)
+                    continue
 
-                # if nothing to do save the least coordonates
-                if not len(char) and not len(diff):
-                    if not skip:
-                        skip = True
-                        last_skip_c = c
-                        last_skip_r = r
+                # Zone attributes are serial, the zone of a cell is validated again by its delimiter if needed
+                if zone is not pen_zone:
+                    d = c
+                    while d > 0 and zones[d - 1] is zone:
+                        d -= 1
+                    write(d, texts[d])
 
-                previous_zone = zone
-                previous_text = text
-            previous_zone = ZoneAttributes()
-            char_double_w_inline = False
+                write(c, text, char)
 
-        reset_text = TextAttributes()
-        data += previous_text.diff(reset_text)
+                if ending and c + 1 < self._screen_width:
+                    # The blanks following the cell are filled as its zone's, the next zones are declared again
+                    flush()
+                    data += TEXT_TRANSITIONS.get(pen_text, blank(c))
+                    pen_text = blank(c)
+                    data += Layout.fillLine()
+
+            if len(data):
+                yield bytes(data)
+                data.clear()
+
+        flush()
+        data += TEXT_TRANSITIONS.get(pen_text, default_text)
+
+        if len(data):
+            yield bytes(data)
+
+    def _rewrite(self, cursor: CursorPlanner, r: int, c: int, zones: list, texts: list, chars: list, text: TextAttributes, zone: ZoneAttributes, vm: VisualizationModule) -> bytes:
+        # Characters between the cursor and the cell (r, c), if they can be written again unchanged with the current attributes
+        cursor_r, cursor_c = cursor.position()
+        if cursor_r != r + 1 or cursor_c is None or cursor_c > c or c - cursor_c >= Videotex.REWRITE_MAX:
+            return None
+
+        if text.double_height or text.double_width:
+            return None
+
+        data = b''
+        for i in range(cursor_c - 1, c):
+            # Overwriting a zone delimiter would end its zone
+            if texts[i] is not text or zones[i] is not zone or (zones[i - 1] if i else ZoneAttributes().intern()) is not zone:
+                return None
+            if chars[i] == '':
+                if text.inverted:
+                    return None
+                data += encodeCharacter(' ', vm)
+            else:
+                data += encodeCharacter(chars[i][0:1], vm)
 
-        log(DEBUG, 'VDT generated:' + data.hex())
         return data
-    
+
     def setText(self, text: str, r: int, c: int, attribute: TextAttributes = None):
         if r < 1 or c < 1 or r > self._screen_height or c > self._screen_width:
             log(ERROR, 'Invalid argument passed.')
             return
+        if attribute is not None:
+            attribute = attribute.intern()
         while len(text):
-            self.text_buf[r - 1][c - 1] = text[0:1]
+            self._setChar(r - 1, c - 1, text[0:1])
             if attribute is not None:
-                self.text_attributes_buf[r - 1][c - 1] = copy.deepcopy(attribute)
+                self._setTextAttributes(r - 1, c - 1, attribute)
             c += 1
             if c > self._screen_width:
                 c = 1
@@ -112,23 +315,24 @@ class Videotex:
         if r < 1 or c < 1 or r + h - 1 > self._screen_height or c + w - 1 > self._screen_width:
             log(ERROR, 'Invalid argument passed.')
             return
-        
+
+        zoneAttribute = zoneAttribute.intern()
         for i in range(h):
             for j in range(w):
-                self.zone_attributes_buf[r - 1 + i][c - 1 + j] = copy.deepcopy(zoneAttribute)
-                self.text_buf[r - 1 + i][c - 1 + j] = ''
+                self._setZoneAttributes(r - 1 + i, c - 1 + j, zoneAttribute)
+                self._setChar(r - 1 + i, c - 1 + j, '')
 
     def drawHR(self, r: int):
         if r < 1 or r > 24:
             log(ERROR, 'Invalid argument given.')
         for c in range(self._screen_width):
-            self.text_buf[r - 1][c] = '–'
+            self._setChar(r - 1, c, '–')
         
     def drawVR(self, c: int):
         if c < 1 or c > 40:
             log(ERROR, 'Invalid argument given.')
         for r in range(self._screen_height):
-            self.text_buf[r][c - 1] = "|"
+            self._setChar(r, c - 1, "|")
 
     def drawFrame(self, r: int, c: int, h: int, w: int):
         if r < 1 or c < 1 or r + h > self._screen_height or c + w > self._screen_width:
@@ -136,17 +340,17 @@ class Videotex:
             return
         
         for i in range(h):
-            self.text_buf[i + r][c - 1] = '|'
-            self.text_buf[i + r][c + w - 1] = '|'
+            self._setChar(i + r, c - 1, '|')
+            self._setChar(i + r, c + w - 1, '|')
 
         for i in range(w):
-            self.text_buf[r - 1][i + c] = '–'
-            self.text_buf[r + h - 1][i + c] = '–'
+            self._setChar(r - 1, i + c, '–')
+            self._setChar(r + h - 1, i + c, '–')
 
-        self.text_buf[r - 1][c - 1] = '+'
-        self.text_buf[r - 1 + h][c - 1] = '+'
-        self.text_buf[r - 1][c - 1 + w] = '+'
-        self.text_buf[r - 1 + h][c - 1 + w] = '+'
+        self._setChar(r - 1, c - 1, '+')
+        self._setChar(r - 1 + h, c - 1, '+')
+        self._setChar(r - 1, c - 1 + w, '+')
+        self._setChar(r - 1 + h, c - 1 + w, '+')
 
     def toVideotexFile(self, destination: str = '.', filename: str = 'PAGE'):
         
@@ -154,10 +358,96 @@ class Videotex:
             vm_str = 'VGP5' if vm == VisualizationModule.VGP5 else 'VGP2'
             filepath = os.path.join(destination, filename + '_' +  vm_str  + '_.VDT')
             log(DEBUG, filepath)
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            with open(filepath, 'wb') as binary_file:
-                binary_file.write(self.toVideotex(vm=vm))
+            # Written aside then renamed, a server reading the file meanwhile gets either page whole
+            temporary_filepath = filepath + '.tmp'
+            with open(temporary_filepath, 'wb') as binary_file:
+                for chunk in self.iterVideotex(vm=vm):
+                    binary_file.write(chunk)
                 binary_file.close()
+            os.replace(temporary_filepath, filepath)
+
+
+class _LastUpdate:
+    # Rows of a Videotex as they were on its last update, from the current ones and the mutated cells' old values
+
+    def __init__(self, videotex: Videotex, dirty: dict) -> None:
+        self._videotex = videotex
+        self._dirty = dirty
+
+    def _row(self, r: int) -> tuple:
+        zones, texts, chars = (list(cells) for cells in self._videotex._row(r))
+
+        for c, (zone, text, char) in self._dirty.get(r, {}).items():
+            zones[c] = zone
+            texts[c] = text
+            chars[c] = char
+
+        return zones, texts, chars
+
+
+_DEFAULT_TEXT_ID = TextAttributes().intern()._id
+_DEFAULT_ZONE_ID = ZoneAttributes().intern()._id
+
+
+class CompactVideotex(Videotex):
+    '''
+    Videotex page stored in flat arrays instead of per cell objects.
+    Glyphs are kept as code points and attributes as their one byte interned ids, a page weighs a few kilobytes and allocates
+    three buffers.
+    '''
+
+    def _allocate(self):
+        size = self._screen_height * self._screen_width
+
+        self._glyphs = array('I', [0]) * size
+        self._text_ids = bytearray([_DEFAULT_TEXT_ID]) * size
+        self._zone_ids = bytearray([_DEFAULT_ZONE_ID]) * size
+
+    def _row(self, r: int) -> tuple:
+        start = r * self._screen_width
+        end = start + self._screen_width
+
+        zone_states = ZONE_TRANSITIONS.states
+        text_states = TEXT_TRANSITIONS.states
+
+        zones = [zone_states[id] for id in self._zone_ids[start:end]]
+        texts = [text_states[id] for id in self._text_ids[start:end]]
+        chars = [chr(glyph) if glyph else '' for glyph in self._glyphs[start:end]]
+
+        return zones, texts, chars
+
+    def _differingRows(self, previous: "Videotex") -> list:
+        # The stored ids and code points are compared as they are, buffers equal as a whole are not looked at per row
+        # and rows are only built for the ones differing
+        if not isinstance(previous, CompactVideotex):
+            return super()._differingRows(previous)
+
+        rows = set()
+        width = self._screen_width
+        for buffer, old_buffer in ((self._glyphs, previous._glyphs), (self._text_ids, previous._text_ids), (self._zone_ids, previous._zone_ids)):
+            if buffer == old_buffer:
+                continue
+            for r in range(self._screen_height):
+                start = r * width
+                if r not in rows and buffer[start:start + width] != old_buffer[start:start + width]:
+                    rows.add(r)
+
+        return sorted(rows)
+
+    def _cell(self, r: int, c: int) -> tuple:
+        i = r * self._screen_width + c
+        glyph = self._glyphs[i]
+
+        return ZONE_TRANSITIONS.states[self._zone_ids[i]], TEXT_TRANSITIONS.states[self._text_ids[i]], chr(glyph) if glyph else ''
+
+    def _setChar(self, r: int, c: int, char: str):
+        self._touch(r, c)
+        self._glyphs[r * self._screen_width + c] = ord(char) if len(char) else 0
 
+    def _setTextAttributes(self, r: int, c: int, attribute: TextAttributes):
+        self._touch(r, c)
+        self._text_ids[r * self._screen_width + c] = attribute.intern()._id
 
+    def _setZoneAttributes(self, r: int, c: int, attribute: ZoneAttributes):
+        self._touch(r, c)
+        self._zone_ids[r * self._screen_width + c] = attribute.intern()._id
@@ -0,0 +1,203 @@
+import pyminitel.visualization_module as visualization_module
+from pyminitel.alphanumerical import G0, VGP2, VGP5, SC, ES, SS2, ascii_to_alphanumerical
+from pyminitel.layout import Layout
+
+import codecs, re
+from functools import lru_cache
+from logging import log, ERROR
+
+# Videotex text codecs, registered when this module is imported:
+#     'Numéro'.encode('videotex-vgp5') and b'Num\x19\x42ero'.decode('videotex-vgp5')
+# Encoding uses ascii_to_alphanumerical's substitutions, VGP2 spelling the characters it lacks.
+# The 'videotex-replace' error handler logs what can't be converted and replaces it by '_'.
+
+# Second bytes of the SS2 sequences followed by the accentuated letter
+ACCENTS = b'\x41\x42\x43\x48\x4b'
+
+CODEC_NAMES = {
+    visualization_module.VisualizationModule.VGP2: 'videotex-vgp2',
+    visualization_module.VisualizationModule.VGP5: 'videotex-vgp5',
+}
+
+
+def _encodingTable(vm_table: dict) -> dict:
+    # Lowest priority first, like ascii_to_alphanumerical's lookups order
+    table = {}
+    for substitutions in (ES, SC, vm_table, G0):
+        for c, values in substitutions.items():
+            table[ord(c)] = values[0]
+    return table
+
+def _decodingTables(vm_table: dict) -> tuple:
+    # Single bytes, decoded by charmap_decode, and SS2 sequences
+    single = {}
+    for substitutions in (G0, SC):
+        for c, values in substitutions.items():
+            single.setdefault(values[0][0], c)
+
+    sequences = {}
+    for c, values in vm_table.items():
+        if values[0][0:1] == SS2:
+            sequences.setdefault(values[0], c)
+
+    return single, sequences
+
+def _replace(error: UnicodeError) -> tuple:
+    if isinstance(error, UnicodeEncodeError):
+        log(ERROR, 'Unable to convert the value "' + error.object[error.start:error.end] + '"')
+        return '_' * (error.end - error.start), error.end
+
+    log(ERROR, 'Unable to convert bytes ' + error.object[error.start:error.end].hex())
+    return '_', error.end
+
+codecs.register_error('videotex-replace', _replace)
+
+
+class VideotexCodec:
+    '''
+    Encoding and decoding tables of a Visualization Module's character set.
+    '''
+
+    def __init__(self, name: str, vm_table: dict):
+        self._name = name
+        self._encoding_table = _encodingTable(vm_table)
+        self._single, self._sequences = _decodingTables(vm_table)
+
+    def encode(self, text: str, errors: str = 'strict') -> tuple:
+        return codecs.charmap_encode(text, errors, self._encoding_table)
+
+    def decode(self, data: bytes, errors: str = 'strict', final: bool = True) -> tuple:
+        '''
+        Decode data, SS2 sequences included.
+
+            Returns:
+                text (str): Decoded text
+                consumed (int): Bytes decoded, an incomplete SS2 sequence ending data is left when final is False
+        '''
+        data = bytes(data)
+        parts = data.split(SS2)
+
+        text = [codecs.charmap_decode(parts[0], errors, self._single)[0]]
+        consumed = len(parts[0])
+
+        for i in range(1, len(parts)):
+            part = parts[i]
+            n = 3 if len(part) and part[0] in ACCENTS else 2
+            last = i == len(parts) - 1
+            if last and not final and len(part) < n - 1:
+                break
+
+            sequence = SS2 + part[:n - 1]
+            if sequence in self._sequences:
+                text.append(self._sequences[sequence])
+            else:
+                text.append(self._error(data, consumed, consumed + len(sequence), errors))
+
+            text.append(codecs.charmap_decode(part[n - 1:], errors, self._single)[0])
+            consumed += 1 + len(part)
+
+        return ''.join(text), consumed
+
+    def _error(self, data: bytes, start: int, end: int, errors: str) -> str:
+        error = UnicodeDecodeError(self._name, data, start, end, 'unknown SS2 sequence')
+        replacement, _ = codecs.lookup_error(errors)(error)
+        return replacement
+
+    def codecInfo(self) -> codecs.CodecInfo:
+        codec = self
+
+        class IncrementalEncoder(codecs.IncrementalEncoder):
+            def encode(self, text, final = False):
+                return codec.encode(text, self.errors)[0]
+
+        class IncrementalDecoder(codecs.BufferedIncrementalDecoder):
+            # Keeps an SS2 sequence split between two reads until it is complete
+            def _buffer_decode(self, data, errors, final):
+                return codec.decode(data, errors, final)
+
+        class StreamWriter(codecs.StreamWriter):
+            def encode(self, text, errors = 'strict'):
+                return codec.encode(text, errors)
+
+        class StreamReader(codecs.StreamReader):
+            def decode(self, data, errors = 'strict'):
+                return codec.decode(data, errors, False)
+
+        return codecs.CodecInfo(
+            name=self._name,
+            encode=self.encode,
+            decode=self.decode,
+            incrementalencoder=IncrementalEncoder,
+            incrementaldecoder=IncrementalDecoder,
+            streamwriter=StreamWriter,
+            streamreader=StreamReader,
+        )
+
+
+CODECS = {
+    'videotex-vgp2': VideotexCodec('videotex-vgp2', VGP2),
+    'videotex-vgp5': VideotexCodec('videotex-vgp5', VGP5),
+}
+
+def _search(name: str) -> codecs.CodecInfo:
+    codec = CODECS.get(name.replace('_', '-'))
+    if codec is None:
+        return None
+    return codec.codecInfo()
+
+codecs.register(_search)
+
+
+# Runs of a character encodeText may repeat with REP
+RUNS = re.compile(r'(.)\1+', re.DOTALL)
+
+# Texts longer than this are encoded without being memoized
+TEXT_CACHE_MAX_LENGTH = 256
+
+def encodeText(text: str, vm: visualization_module.VisualizationModule) -> bytes:
+    '''
+    Encode a text as Minitel.print sends it, runs of a character shortened by REP.
+    Labels and menu entries are encoded once, see cacheInfo.
+
+        Parameters:
+            text (str): Text to encode
+            vm (VisualizationModule): Targeted Visualization Module
+
+        Returns:
+            data (bytes): The encoded text
+    '''
+    if len(text) > TEXT_CACHE_MAX_LENGTH:
+        return _encodeText(text, vm)
+    return _cachedEncodeText(text, vm)
+
+def _encodeText(text: str, vm: visualization_module.VisualizationModule) -> bytes:
+    codec = CODEC_NAMES[vm]
+
+    data = b''
+    i = 0
+    for run in RUNS.finditer(text):
+        data += text[i:run.start()].encode(codec, 'videotex-replace')
+        encoded = run.group(1).encode(codec, 'videotex-replace')
+        data += Layout.repeatCharacter(encoded, run.end() - run.start(), vm)
+        i = run.end()
+    data += text[i:].encode(codec, 'videotex-replace')
+
+    return data
+
+_cachedEncodeText = lru_cache(maxsize=1024)(_encodeText)
+
+@lru_cache(maxsize=1024)
+def encodeCharacter(c: str, vm: visualization_module.VisualizationModule) -> bytes:
+    '''
+    Memoized ascii_to_alphanumerical, for the encoders going through pages cell by cell.
+    '''
+    return ascii_to_alphanumerical(c, vm)
+
+def cacheInfo() -> dict:
+    '''
+    Returns the hits, misses and sizes of the encoding caches, by function name.
+    '''
+    return {
+        'encodeText': _cachedEncodeText.cache_info(),
+        'encodeCharacter': encodeCharacter.cache_info(),
+    }
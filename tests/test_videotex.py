@@ -0,0 +1,81 @@
+import random
+
+from pyminitel.videotex import Videotex, CompactVideotex
+from pyminitel.emulator import TerminalState
+from pyminitel.attributes import TextAttributes, ZoneAttributes, CharacterColor, BackgroundColor
+from pyminitel.visualization_module import VisualizationModule
+
+import pytest
+
+
+def screen(state: TerminalState) -> list:
+    # Cells as they look: blanks only show their zone and inversion
+    rows = []
+    for r in range(1, 25):
+        zones, texts, chars = state.row(r)
+        row = []
+        for zone, text, char in zip(zones, texts, chars):
+            char = char or ' '
+            cell = (char, zone.background, zone.masking, text.inverted)
+            if char != ' ':
+                cell += (text.color, text.blinking, text.double_height, text.double_width)
+            row.append(cell)
+        rows.append(row)
+    return rows
+
+def displayed(*updates: bytes) -> list:
+    state = TerminalState()
+    state.feed(b'\x0c')
+    for update in updates:
+        state.feed(update)
+    return screen(state)
+
+def randomPage(cls, rng: random.Random) -> Videotex:
+    page = cls()
+    for _ in range(rng.randint(0, 4)):
+        h, w = rng.randint(1, 3), rng.randint(1, 12)
+        zone = ZoneAttributes().withAttributes(color=rng.choice(list(BackgroundColor)))
+        page.drawBox(rng.randint(1, 24 - h + 1), rng.randint(1, 40 - w + 1), h, w, zone)
+    for _ in range(rng.randint(0, 6)):
+        text = ''.join(rng.choice('ab x') for _ in range(rng.randint(1, 10)))
+        attribute = TextAttributes().withAttributes(color=rng.choice(list(CharacterColor)), inverted=rng.random() < .3)
+        page.setText(text, rng.randint(1, 24), rng.randint(1, 40 - len(text) + 1), attribute)
+    return page
+
+
+@pytest.mark.parametrize('cls', [Videotex, CompactVideotex])
+def test_diff_ending_zone_fills_blanks_with_their_attributes(cls):
+    previous = cls()
+    previous.drawBox(17, 9, 1, 8, ZoneAttributes().withAttributes(color=BackgroundColor.WHITE))
+    page = cls()
+    page.setText('xcxex x-', 17, 5, TextAttributes().withAttributes(color=CharacterColor.BLACK, inverted=True))
+
+    vm = VisualizationModule.VGP5
+    assert displayed(previous.toVideotex(vm), page.diffTo(previous, vm)) == displayed(page.toVideotex(vm))
+
+@pytest.mark.parametrize('cls', [Videotex, CompactVideotex])
+def test_diff_displays_the_full_render(cls):
+    rng = random.Random(0)
+    vm = VisualizationModule.VGP5
+    for _ in range(300):
+        previous, page = randomPage(cls, rng), randomPage(cls, rng)
+        assert displayed(previous.toVideotex(vm), page.diffTo(previous, vm)) == displayed(page.toVideotex(vm))
+
+@pytest.mark.parametrize('cls', [Videotex, CompactVideotex])
+def test_updates_display_the_full_render(cls):
+    rng = random.Random(0)
+    vm = VisualizationModule.VGP5
+    for _ in range(100):
+        page = randomPage(cls, rng)
+        updates = [page.toVideotexUpdate(vm)]
+        for _ in range(3):
+            change = randomPage(cls, rng)
+            for r in range(24):
+                for c in range(40):
+                    zone, text, char = change._cell(r, c)
+                    if char or zone is not ZoneAttributes().intern():
+                        page._setZoneAttributes(r, c, zone)
+                        page._setTextAttributes(r, c, text)
+                        page._setChar(r, c, char)
+            updates.append(page.toVideotexUpdate(vm))
+            assert displayed(*updates) == displayed(page.toVideotex(vm))